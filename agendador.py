@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+import traceback
+
+_FIM = object()
+
+
+class EstatisticaEtapa:
+    """Contadores de uma etapa do pipeline de lote."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.concluidos = 0
+        self.falhas = 0
+        self.tempo_ocupado = 0.0
+        self.lock = threading.Lock()
+
+    def registrar(self, duracao, sucesso):
+        """Contabiliza um PCN processado pela etapa."""
+        with self.lock:
+            self.tempo_ocupado += duracao
+            if sucesso:
+                self.concluidos += 1
+            else:
+                self.falhas += 1
+
+    def vazao_por_hora(self):
+        """PCNs concluídos por hora de trabalho efetivo da etapa."""
+        if not self.tempo_ocupado:
+            return 0.0
+        return self.concluidos * 3600 / self.tempo_ocupado
+
+
+def processar_lote(arquivos, extrair, gerar, renderizar, geracoes_simultaneas=1):
+    """Processa vários PCNs em três etapas sobrepostas: extração, geração e renderização.
+
+    Enquanto o PCN n está na geração, o PCN n+1 já é extraído e o PCN n-1 é
+    renderizado. A falha de um PCN em qualquer etapa não interrompe os demais.
+    Retorna um dicionário {arquivo: caminho do DOCX ou exceção}.
+    """
+    # Filas limitadas impedem que a extração se adiante demais em relação à geração
+    fila_geracao = queue.Queue(maxsize=geracoes_simultaneas)
+    fila_renderizacao = queue.Queue(maxsize=1)
+    etapas = {
+        "extração": EstatisticaEtapa("extração"),
+        "geração": EstatisticaEtapa("geração"),
+        "renderização": EstatisticaEtapa("renderização"),
+    }
+    resultados = {}
+    inicio = time.monotonic()
+
+    def informar(nome_etapa, arquivo, sucesso):
+        estado = "concluído" if sucesso else "FALHOU"
+        print(
+            f"[{nome_etapa}] {arquivo} {estado} | filas: geração={fila_geracao.qsize()} "
+            f"renderização={fila_renderizacao.qsize()}"
+        )
+
+    def executar(nome_etapa, arquivo, funcao, *args):
+        t0 = time.monotonic()
+        try:
+            resultado = funcao(arquivo, *args)
+        except Exception as e:
+            etapas[nome_etapa].registrar(time.monotonic() - t0, False)
+            print(f"\n❌ ERRO na {nome_etapa} de {arquivo}: {str(e)}")
+            traceback.print_exc()
+            resultados[arquivo] = e
+            informar(nome_etapa, arquivo, False)
+            return None, False
+        etapas[nome_etapa].registrar(time.monotonic() - t0, True)
+        informar(nome_etapa, arquivo, True)
+        return resultado, True
+
+    def etapa_extracao():
+        for arquivo in arquivos:
+            documento, sucesso = executar("extração", arquivo, extrair)
+            if sucesso:
+                fila_geracao.put((arquivo, documento))
+        for _ in range(geracoes_simultaneas):
+            fila_geracao.put(_FIM)
+
+    def etapa_geracao():
+        while True:
+            tarefa = fila_geracao.get()
+            if tarefa is _FIM:
+                fila_renderizacao.put(_FIM)
+                return
+            arquivo, documento = tarefa
+            relatorio, sucesso = executar("geração", arquivo, gerar, documento)
+            if sucesso:
+                fila_renderizacao.put((arquivo, relatorio))
+
+    def etapa_renderizacao():
+        finalizadas = 0
+        while finalizadas < geracoes_simultaneas:
+            tarefa = fila_renderizacao.get()
+            if tarefa is _FIM:
+                finalizadas += 1
+                continue
+            arquivo, relatorio = tarefa
+            nome_saida, sucesso = executar("renderização", arquivo, renderizar, relatorio)
+            if sucesso:
+                resultados[arquivo] = nome_saida
+                print(f"\n Processamento completo: {arquivo} → {nome_saida}")
+
+    threads = [threading.Thread(target=etapa_extracao, name="extracao")]
+    threads += [threading.Thread(target=etapa_geracao, name=f"geracao-{n}") for n in range(geracoes_simultaneas)]
+    threads.append(threading.Thread(target=etapa_renderizacao, name="renderizacao"))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    imprimir_resumo_lote(etapas, time.monotonic() - inicio)
+    return resultados
+
+
+def imprimir_resumo_lote(etapas, duracao_total):
+    """Imprime a vazão e o tempo ocupado de cada etapa do lote."""
+    print("\nResumo do lote:")
+    print(f"{'Etapa':<14}{'OK':>5}{'Falhas':>8}{'Ocupado (s)':>13}{'PCN/h':>9}")
+    for etapa in etapas.values():
+        print(
+            f"{etapa.nome:<14}{etapa.concluidos:>5}{etapa.falhas:>8}"
+            f"{etapa.tempo_ocupado:>13.1f}{etapa.vazao_por_hora():>9.1f}"
+        )
+    concluidos = etapas["renderização"].concluidos
+    if duracao_total > 0:
+        print(f"Total: {concluidos} PCNs em {duracao_total:.1f}s ({concluidos * 3600 / duracao_total:.1f} PCN/h)")
@@ -4,4 +4,8 @@ api_version="";
 
 ENDPOINT = "";
 API_KEY="";
-API_VERSION="";
\ No newline at end of file
+API_VERSION="";
+
+# Cota da implantação no Azure OpenAI, compartilhada por todos os PCNs do lote
+RPM_LIMITE = 300
+TPM_LIMITE = 50000
@@ -0,0 +1,139 @@
+"""Executa o pipeline completo de main.py contra o servidor simulado, com PCNs sintéticos.
+
+Mede relatórios por hora, tempos por etapa (a partir da telemetria) e o pico de memória,
+sem rede e sem custo de API. Argumentos após "--" são repassados para main.py.
+
+Uso: python benchmarks/bench_pipeline.py --pcns 4 --latencia 0.5 --taxa-429 0.05 -- --agrupar
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_REPOSITORIO = os.path.dirname(DIRETORIO_BENCHMARKS)
+sys.path.insert(0, DIRETORIO_BENCHMARKS)
+sys.path.insert(0, DIRETORIO_REPOSITORIO)
+
+from pdfs_sinteticos import gerar_pcn, gerar_documento_base
+from servidor_simulado import ServidorSimulado
+from telemetria import percentil
+
+
+def preparar_diretorio(destino, endereco, args):
+    """Copia o código e o prompt para um diretório de trabalho com PDFs sintéticos e api_config próprio."""
+    for caminho in glob.glob(os.path.join(DIRETORIO_REPOSITORIO, "*.py")) + [os.path.join(DIRETORIO_REPOSITORIO, "prompt.txt")]:
+        if os.path.basename(caminho) != "api_config.py":
+            shutil.copy(caminho, destino)
+    with open(os.path.join(destino, "api_config.py"), "w", encoding="utf-8") as f:
+        f.write(
+            f'ENDPOINT = "{endereco}"\n'
+            'API_KEY = "simulado"\n'
+            'API_VERSION = "2024-10-21"\n'
+            f"RPM_LIMITE = {args.rpm}\n"
+            f"TPM_LIMITE = {args.tpm}\n"
+        )
+    os.makedirs(os.path.join(destino, "BASE"))
+    os.makedirs(os.path.join(destino, "PC"))
+    for indice in range(args.documentos_base):
+        gerar_documento_base(os.path.join(destino, "BASE", f"base_{indice + 1}.pdf"), args.paginas_base, semente=indice)
+    for indice in range(args.pcns):
+        gerar_pcn(
+            os.path.join(destino, "PC", f"pcn_{indice + 1:02d}.pdf"),
+            args.paginas_pc,
+            args.unidades_curriculares,
+            semente=indice,
+        )
+
+
+def resumir_telemetria(diretorio):
+    """Imprime contagem, p50, p95 e tempo total de cada etapa registrada na telemetria."""
+    registros = []
+    for caminho in glob.glob(os.path.join(diretorio, "TELEMETRIA", "*.jsonl")):
+        with open(caminho, "r", encoding="utf-8") as f:
+            registros += [json.loads(linha) for linha in f if linha.strip()]
+    print(f"\n{'Etapa':<26}{'N':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'Total (s)':>11}")
+    for nome in sorted({registro["nome"] for registro in registros}):
+        duracoes = [registro["duracao"] for registro in registros if registro["nome"] == nome]
+        print(f"{nome:<26}{len(duracoes):>6}{percentil(duracoes, 50):>10.2f}{percentil(duracoes, 95):>10.2f}{sum(duracoes):>11.1f}")
+    primeiros_tokens = [registro["tempo_primeiro_token"] for registro in registros if registro.get("tempo_primeiro_token") is not None]
+    if primeiros_tokens:
+        print(f"Tempo até o primeiro token: p50 {percentil(primeiros_tokens, 50):.2f}s, p95 {percentil(primeiros_tokens, 95):.2f}s")
+
+
+def main():
+    argumentos = sys.argv[1:]
+    argumentos_main = []
+    if "--" in argumentos:
+        posicao = argumentos.index("--")
+        argumentos, argumentos_main = argumentos[:posicao], argumentos[posicao + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pcns", type=int, default=4, help="quantidade de PCNs sintéticos")
+    parser.add_argument("--paginas-pc", type=int, default=20)
+    parser.add_argument("--paginas-base", type=int, default=60)
+    parser.add_argument("--documentos-base", type=int, default=2)
+    parser.add_argument("--unidades-curriculares", type=int, default=12)
+    parser.add_argument("--latencia", type=float, default=0.5, help="segundos até o primeiro token")
+    parser.add_argument("--tokens-resposta", type=int, default=600, help="tokens aproximados de cada resposta")
+    parser.add_argument("--tokens-por-segundo", type=float, default=80.0, help="velocidade de geração simulada")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração das requisições respondidas com 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--rpm", type=int, default=10000)
+    parser.add_argument("--tpm", type=int, default=10000000)
+    parser.add_argument("--manter", action="store_true", help="não apaga o diretório de trabalho ao final")
+    args = parser.parse_args(argumentos)
+
+    diretorio = tempfile.mkdtemp(prefix="bench_pipeline_")
+    servidor = ServidorSimulado(
+        latencia=args.latencia,
+        tokens_resposta=args.tokens_resposta,
+        tokens_por_segundo=args.tokens_por_segundo,
+        taxa_429=args.taxa_429,
+        retry_after=args.retry_after,
+        unidades_curriculares=args.unidades_curriculares,
+    )
+    try:
+        with servidor:
+            preparar_diretorio(diretorio, servidor.endereco, args)
+            print(f"Diretório de trabalho: {diretorio}")
+            print(f"Executando main.py {' '.join(argumentos_main)} com {args.pcns} PCNs...")
+            inicio = time.perf_counter()
+            resultado = subprocess.run(
+                [sys.executable, "main.py", *argumentos_main],
+                cwd=diretorio,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+            duracao = time.perf_counter() - inicio
+        if resultado.returncode != 0:
+            print(resultado.stdout[-4000:])
+            sys.exit(f"main.py terminou com código {resultado.returncode}")
+
+        relatorios = glob.glob(os.path.join(diretorio, "RELATORIOS", "*.docx"))
+        # ru_maxrss é o maior pico entre os processos filhos (em KB no Linux)
+        pico_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        contadores = servidor.contadores
+        print(f"\nRelatórios gerados: {len(relatorios)}/{args.pcns} em {duracao:.1f}s")
+        print(f"Relatórios por hora: {len(relatorios) * 3600 / duracao:.1f}")
+        print(f"Requisições ao servidor: {contadores['requisicoes']} ({contadores['respostas_429']} respostas 429)")
+        if contadores["tokens_prompt"]:
+            print(f"Tokens de entrada em cache: {100 * contadores['tokens_cache'] / contadores['tokens_prompt']:.1f}%")
+        print(f"Pico de memória (RSS): {pico_rss:.0f} MB")
+        resumir_telemetria(diretorio)
+    finally:
+        if args.manter:
+            print(f"\nDiretório mantido em {diretorio}")
+        else:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compara a montagem de tabelas DOCX célula a célula (caminho anterior) com adicionar_tabela.
+
+Uso: python benchmarks/bench_tabela_docx.py [--linhas 10 50 200] [--colunas 5] [--repeticoes 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+from tabela_docx import adicionar_tabela
+
+PALAVRAS = "competência unidade curricular automação carga horária indicador habilidade atitude conhecimento".split()
+
+
+def tabela_sintetica(linhas, colunas, palavras_por_celula=40):
+    """Cabeçalho e linhas com texto longo, como nas tabelas por UC dos itens 2, 3 e 6 a 10."""
+    aleatorio = random.Random(42)
+    cabecalho = [f"Coluna {c + 1}" for c in range(colunas)]
+    dados = [
+        [" ".join(aleatorio.choice(PALAVRAS) for _ in range(palavras_por_celula)) for _ in range(colunas)]
+        for _ in range(linhas)
+    ]
+    return cabecalho, dados
+
+
+def tabela_celula_a_celula(doc, colunas, dados):
+    """Caminho anterior de gerar_relatorio_docx: add_row() e cell.text para cada célula."""
+    table = doc.add_table(rows=1, cols=len(colunas))
+    table.style = 'Table Grid'
+    head_cells = table.rows[0].cells
+    for idx, col in enumerate(colunas):
+        head_cells[idx].text = col
+        for paragraph in head_cells[idx].paragraphs:
+            for run in paragraph.runs:
+                run.bold = True
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    for row_data in dados:
+        cells = table.add_row().cells
+        for idx, text in enumerate(row_data):
+            if idx < len(cells):
+                cells[idx].text = text
+    table.autofit = True
+    return table
+
+
+def medir(funcao, colunas, dados, repeticoes):
+    """Menor tempo entre as repetições, sem contar a criação do documento."""
+    tempos = []
+    for _ in range(repeticoes):
+        doc = Document()
+        inicio = time.perf_counter()
+        funcao(doc, colunas, dados)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def conteudo(tabela):
+    """Texto de todas as células, para conferir que os dois caminhos geram a mesma tabela."""
+    return [[celula.text for celula in linha.cells] for linha in tabela.rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--colunas", type=int, default=5)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'Linhas':>8}{'Célula a célula (s)':>22}{'adicionar_tabela (s)':>23}{'Ganho':>9}")
+    for linhas in args.linhas:
+        colunas, dados = tabela_sintetica(linhas, args.colunas)
+        assert conteudo(tabela_celula_a_celula(Document(), colunas, dados)) == conteudo(adicionar_tabela(Document(), colunas, dados))
+        anterior = medir(tabela_celula_a_celula, colunas, dados, args.repeticoes)
+        novo = medir(adicionar_tabela, colunas, dados, args.repeticoes)
+        print(f"{linhas:>8}{anterior:>22.3f}{novo:>23.3f}{anterior / novo:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
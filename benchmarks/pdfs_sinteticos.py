@@ -0,0 +1,75 @@
+"""Gera PDFs sintéticos (PCN e documentos base) para os benchmarks, sem dependências externas."""
+import random
+
+PALAVRAS = (
+    "competencia unidade curricular automacao carga horaria indicador habilidade atitude conhecimento "
+    "cliente atendimento vendas processo qualidade tecnologia mercado profissional planejamento gestao "
+    "seguranca comunicacao etica inovacao dados digital sustentabilidade negociacao equipe projeto"
+).split()
+
+LINHAS_POR_PAGINA = 45
+
+
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def gerar_pdf(caminho, paginas):
+    """Grava um PDF mínimo com uma página por texto da lista (texto ASCII, fonte Helvetica)."""
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    filhos = []
+    for indice, texto in enumerate(paginas):
+        id_pagina = 4 + 2 * indice
+        filhos.append(f"{id_pagina} 0 R")
+        conteudo = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({_escapar(linha)}) Tj T*" for linha in texto.split("\n")) + " ET"
+        objetos.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {id_pagina + 1} 0 R >>".encode("latin-1")
+        )
+        objetos.append(f"<< /Length {len(conteudo)} >>\nstream\n{conteudo}\nendstream".encode("latin-1"))
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(filhos)}] /Count {len(paginas)} >>".encode("latin-1")
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += f"{numero} 0 obj\n".encode("latin-1") + objeto + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    saida += b"".join(f"{posicao:010d} 00000 n \n".encode("latin-1") for posicao in posicoes)
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode("latin-1")
+    with open(caminho, "wb") as f:
+        f.write(saida)
+
+
+def _frase(aleatorio, palavras=12):
+    return " ".join(aleatorio.choice(PALAVRAS) for _ in range(palavras)).capitalize() + "."
+
+
+def _pagina(aleatorio, titulo=None):
+    linhas = [titulo] if titulo else []
+    while len(linhas) < LINHAS_POR_PAGINA:
+        linhas.append(_frase(aleatorio))
+    return "\n".join(linhas)
+
+
+def gerar_pcn(caminho, paginas=20, unidades_curriculares=12, semente=0):
+    """PCN sintético: capa, lista de UCs e páginas de detalhamento."""
+    aleatorio = random.Random(semente)
+    capa = "\n".join([
+        f"Plano de Curso Nacional - Tecnico Sintetico {semente}",
+        "Eixo tecnologico: Gestao e Negocios",
+        f"Carga horaria: {unidades_curriculares * 72} horas",
+        "Unidades Curriculares:",
+    ] + [f"UC{numero}: {_frase(aleatorio, 5)[:-1]}" for numero in range(1, unidades_curriculares + 1)])
+    corpo = [
+        _pagina(aleatorio, f"UC{(indice % unidades_curriculares) + 1}: detalhamento")
+        for indice in range(max(paginas - 1, 0))
+    ]
+    gerar_pdf(caminho, [capa] + corpo)
+
+
+def gerar_documento_base(caminho, paginas=60, semente=0):
+    """Documento base sintético (ex.: estudo de impacto da automação)."""
+    aleatorio = random.Random(1000 + semente)
+    gerar_pdf(caminho, [_pagina(aleatorio, f"Capitulo {indice + 1}") for indice in range(paginas)])
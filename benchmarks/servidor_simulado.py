@@ -0,0 +1,194 @@
+"""Servidor local compatível com o endpoint de chat do Azure OpenAI, para benchmarks sem rede.
+
+Simula latência, velocidade de geração, quantidade de tokens, erros 429 com Retry-After,
+streaming (SSE) e o cache de prefixo do provedor.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# O cache de prefixo do provedor só vale a partir de 1024 tokens, em blocos de 128
+TOKENS_MINIMOS_CACHE = 1024
+BLOCO_CACHE = 128
+
+
+class ServidorSimulado:
+    """Servidor HTTP em uma thread; use como context manager ou com iniciar()/parar()."""
+
+    def __init__(self, latencia=0.5, tokens_resposta=600, tokens_por_segundo=80.0, taxa_429=0.0,
+                 retry_after=1.0, unidades_curriculares=12, porta=0, semente=0):
+        self.latencia = latencia
+        self.tokens_resposta = tokens_resposta
+        self.tokens_por_segundo = tokens_por_segundo
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.unidades_curriculares = unidades_curriculares
+        self.aleatorio = random.Random(semente)
+        self.lock = threading.Lock()
+        self.prefixos = set()
+        self.contadores = {"requisicoes": 0, "respostas_429": 0, "tokens_prompt": 0, "tokens_cache": 0}
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", porta), self._manipulador())
+        self.servidor.daemon_threads = True
+        self.thread = None
+
+    @property
+    def endereco(self):
+        host, porta = self.servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excecao):
+        self.parar()
+
+    def _contar(self, chave, quantidade=1):
+        with self.lock:
+            self.contadores[chave] += quantidade
+
+    def _sortear_429(self):
+        with self.lock:
+            return self.aleatorio.random() < self.taxa_429
+
+    def _tokens_cache(self, messages):
+        """Tokens do prefixo (todas as mensagens menos a última) já vistos em outra requisição."""
+        if len(messages) < 2:
+            return 0
+        prefixo = json.dumps(messages[:-1], ensure_ascii=False, sort_keys=True)
+        chave = hashlib.sha256(prefixo.encode("utf-8")).hexdigest()
+        with self.lock:
+            visto = chave in self.prefixos
+            self.prefixos.add(chave)
+        tokens = len(prefixo) // 4
+        if not visto or tokens < TOKENS_MINIMOS_CACHE:
+            return 0
+        return tokens // BLOCO_CACHE * BLOCO_CACHE
+
+    def _texto_tabela(self, titulo, uc=None):
+        """Item em markdown com uma tabela por UC, com aproximadamente tokens_resposta tokens.
+
+        Com uc, apenas as linhas dessa UC (a fração da resposta que caberia a ela), sem título.
+        """
+        linhas = [titulo, ""] if uc is None else []
+        linhas += ["| UC | Proposta | Justificativa |", "|---|---|---|"]
+        tamanho = len(titulo)
+        tokens = self.tokens_resposta if uc is None else self.tokens_resposta / self.unidades_curriculares
+        numero = 0
+        while tamanho < tokens * 4:
+            numero += 1
+            rotulo = uc or f"UC{(numero - 1) % self.unidades_curriculares + 1}"
+            linha = f"| {rotulo} | Texto simulado {numero} | " + "justificativa simulada " * 4 + "|"
+            linhas.append(linha)
+            tamanho += len(linha)
+        return "\n".join(linhas)
+
+    def _conteudo(self, corpo):
+        """Resposta plausível para as requisições do pipeline (UCs, item, linhas de uma UC ou grupo de itens em JSON)."""
+        ultima = corpo["messages"][-1]["content"]
+        if "Unidades Curriculares (UCs) mencionadas" in ultima:
+            return "\n".join(f"UC{numero}: Unidade curricular simulada {numero}" for numero in range(1, self.unidades_curriculares + 1))
+        formato = corpo.get("response_format") or {}
+        if formato.get("type") == "json_schema":
+            campos = formato["json_schema"]["schema"]["properties"]
+            return json.dumps({campo: self._texto_tabela(f"## {campo[5:]}. Item simulado") for campo in campos}, ensure_ascii=False)
+        item = re.search(r"Gere APENAS o item (\d+)", ultima)
+        uc = re.search(r"somente da (UC\d+)", ultima)
+        return self._texto_tabela(f"## {item.group(1) if item else 0}. Item simulado", uc.group(1) if uc else None)
+
+    def _manipulador(self):
+        servidor = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, dados, cabecalhos=None):
+                corpo = json.dumps(dados).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                for nome, valor in (cabecalhos or {}).items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_POST(self):
+                corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": f"caminho não simulado: {self.path}"}})
+                    return
+                servidor._contar("requisicoes")
+                if servidor._sortear_429():
+                    servidor._contar("respostas_429")
+                    self._json(
+                        429,
+                        {"error": {"code": "429", "message": "Requests to the deployment have exceeded the rate limit (simulado)."}},
+                        {"Retry-After": str(servidor.retry_after)},
+                    )
+                    return
+
+                conteudo = servidor._conteudo(corpo)
+                tokens_prompt = sum(len(mensagem["content"]) for mensagem in corpo["messages"]) // 4
+                tokens_cache = servidor._tokens_cache(corpo["messages"])
+                tokens_resposta = max(1, len(conteudo) // 4)
+                servidor._contar("tokens_prompt", tokens_prompt)
+                servidor._contar("tokens_cache", tokens_cache)
+                uso = {
+                    "prompt_tokens": tokens_prompt,
+                    "completion_tokens": tokens_resposta,
+                    "total_tokens": tokens_prompt + tokens_resposta,
+                    "prompt_tokens_details": {"cached_tokens": tokens_cache},
+                }
+                identificador = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                base = {"id": identificador, "created": int(time.time()), "model": corpo.get("model", "gpt-4o")}
+
+                time.sleep(servidor.latencia)
+                if not corpo.get("stream"):
+                    time.sleep(tokens_resposta / servidor.tokens_por_segundo)
+                    self._json(200, dict(base, object="chat.completion", usage=uso, choices=[{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": conteudo},
+                    }]))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                tamanho_trecho = 40
+                try:
+                    for inicio in range(0, len(conteudo), tamanho_trecho):
+                        trecho = conteudo[inicio:inicio + tamanho_trecho]
+                        time.sleep(len(trecho) / 4 / servidor.tokens_por_segundo)
+                        evento = dict(base, object="chat.completion.chunk", choices=[{
+                            "index": 0, "finish_reason": None, "delta": {"content": trecho},
+                        }])
+                        self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    if (corpo.get("stream_options") or {}).get("include_usage"):
+                        evento = dict(base, object="chat.completion.chunk", choices=[], usage=uso)
+                        self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente encerrou o stream (ex.: marcador de parada encontrado)
+                    pass
+
+        return Manipulador
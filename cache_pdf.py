@@ -0,0 +1,169 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Alterar a versão ou as configurações invalida todas as entradas do cache
+EXTRATOR_VERSAO = "pdfplumber-1"
+CONFIG_EXTRACAO = {"separador_paginas": "\n\n"}
+
+# Tamanho máximo ocupado pelos textos extraídos (2 GB)
+TAMANHO_MAXIMO_CACHE = 2 * 1024 ** 3
+
+# Os acessos às entradas (ordem de remoção) ficam em memória e só são gravados no manifesto
+# a cada INTERVALO_GRAVACAO_ACESSOS segundos, numa nova entrada ou ao fim do processo
+INTERVALO_GRAVACAO_ACESSOS = 60.0
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obter_cache(cache_dir="CACHE"):
+    """Retorna a instância compartilhada do cache de PDFs para o diretório."""
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = CachePDF(cache_dir)
+        return _caches[cache_dir]
+
+
+def hash_arquivo(caminho):
+    """Calcula o SHA-256 do conteúdo de um arquivo."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def escrever_atomico(caminho, texto):
+    """Grava um arquivo de texto de forma atômica (arquivo temporário + rename)."""
+    diretorio = os.path.dirname(caminho) or "."
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+class CachePDF:
+    """Cache de textos extraídos, endereçado pelo conteúdo do PDF e pela versão do extrator."""
+
+    def __init__(self, cache_dir="CACHE", tamanho_maximo=TAMANHO_MAXIMO_CACHE, intervalo_gravacao=INTERVALO_GRAVACAO_ACESSOS):
+        self.diretorio = os.path.join(cache_dir, "pdf")
+        self.manifesto_path = os.path.join(self.diretorio, "manifesto.json")
+        self.tamanho_maximo = tamanho_maximo
+        self.intervalo_gravacao = intervalo_gravacao
+        self.lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.manifesto = self._carregar_manifesto()
+        self.acessos_pendentes = False
+        self.ultima_gravacao = time.monotonic()
+        atexit.register(self.fechar)
+
+    def _carregar_manifesto(self):
+        """Lê o índice de entradas; um índice corrompido é recriado vazio."""
+        if not os.path.exists(self.manifesto_path):
+            return {}
+        try:
+            with open(self.manifesto_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Manifesto do cache de PDFs corrompido. Recriando índice...")
+            return {}
+
+    def _salvar_manifesto(self):
+        escrever_atomico(self.manifesto_path, json.dumps(self.manifesto, ensure_ascii=False, indent=1))
+        self.acessos_pendentes = False
+        self.ultima_gravacao = time.monotonic()
+
+    def fechar(self):
+        """Grava no manifesto os acessos ainda pendentes (chamado também ao fim do processo)."""
+        with self.lock:
+            if self.acessos_pendentes:
+                self._salvar_manifesto()
+
+    def chave(self, caminho):
+        """Chave do PDF: hash do conteúdo, da versão do extrator e das configurações."""
+        configuracao = json.dumps(CONFIG_EXTRACAO, sort_keys=True)
+        base = f"{hash_arquivo(caminho)}|{EXTRATOR_VERSAO}|{configuracao}"
+        return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+    def caminho_texto(self, chave, parcial=False):
+        """Caminho do arquivo de texto de uma entrada (completa ou parcial)."""
+        return os.path.join(self.diretorio, f"{self._nome(chave, parcial)}.txt")
+
+    def _nome(self, chave, parcial):
+        return f"{chave}.parcial" if parcial else chave
+
+    def obter(self, chave, limite_caracteres=None):
+        """Retorna o texto em cache ou None se a entrada não existir.
+
+        Uma extração parcial só é aproveitada se cobrir o limite de caracteres pedido.
+        """
+        for parcial in (False, True):
+            if parcial and limite_caracteres is None:
+                break
+            caminho = self.caminho_texto(chave, parcial)
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    texto = f.read()
+            except FileNotFoundError:
+                continue
+            if parcial and len(texto) < limite_caracteres:
+                return None
+            with self.lock:
+                nome = self._nome(chave, parcial)
+                entrada = self.manifesto.setdefault(nome, {"tamanho": os.path.getsize(caminho)})
+                entrada["ultimo_acesso"] = time.time()
+                self.acessos_pendentes = True
+                if time.monotonic() - self.ultima_gravacao >= self.intervalo_gravacao:
+                    self._salvar_manifesto()
+            return texto
+        return None
+
+    def novo_temporario(self):
+        """Cria um arquivo temporário no diretório do cache para gravação incremental."""
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        os.close(fd)
+        return temporario
+
+    def registrar(self, chave, temporario, origem, completo=True):
+        """Move um arquivo temporário já gravado para a entrada definitiva do cache."""
+        caminho = self.caminho_texto(chave, parcial=not completo)
+        os.replace(temporario, caminho)
+        with self.lock:
+            self.manifesto[self._nome(chave, not completo)] = {
+                "origem": origem,
+                "tamanho": os.path.getsize(caminho),
+                "extrator": EXTRATOR_VERSAO,
+                "completo": completo,
+                "criado_em": time.time(),
+                "ultimo_acesso": time.time(),
+            }
+            # A extração completa substitui qualquer extração parcial anterior
+            if completo and self.manifesto.pop(self._nome(chave, True), None) is not None:
+                os.remove(self.caminho_texto(chave, parcial=True))
+            self._remover_excedente()
+            self._salvar_manifesto()
+
+    def _remover_excedente(self):
+        """Remove as entradas menos usadas até o cache caber no tamanho máximo."""
+        total = sum(entrada["tamanho"] for entrada in self.manifesto.values())
+        por_acesso = sorted(self.manifesto.items(), key=lambda item: item[1].get("ultimo_acesso", 0))
+        for nome, entrada in por_acesso:
+            if total <= self.tamanho_maximo:
+                break
+            try:
+                os.remove(os.path.join(self.diretorio, f"{nome}.txt"))
+            except FileNotFoundError:
+                pass
+            total -= entrada["tamanho"]
+            del self.manifesto[nome]
+            print(f"Cache de PDFs: removida entrada antiga de {entrada.get('origem', nome)}")
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Tamanho máximo ocupado pelas respostas armazenadas (500 MB)
+TAMANHO_MAXIMO_RESPOSTAS = 500 * 1024 ** 2
+
+
+def conexao_wal(local, caminho):
+    """Conexão SQLite em modo WAL da thread atual, guardada em 'local' (threading.local).
+
+    Conexões não são compartilhadas entre threads; cada uma abre a sua na primeira chamada.
+    """
+    conexao = getattr(local, "conexao", None)
+    if conexao is None:
+        conexao = sqlite3.connect(caminho, timeout=30)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        local.conexao = conexao
+    return conexao
+
+
+class RespostaNaoEncontradaError(Exception):
+    """Resposta ausente do cache durante uma execução em modo somente replay."""
+
+
+class CacheRespostas:
+    """Cache persistente das respostas da API em SQLite (modo WAL), separado por namespace."""
+
+    def __init__(self, caminho="CACHE/respostas.sqlite3", namespace="padrao",
+                 tamanho_maximo=TAMANHO_MAXIMO_RESPOSTAS, somente_replay=False):
+        self.caminho = caminho
+        self.namespace = namespace
+        self.tamanho_maximo = tamanho_maximo
+        self.somente_replay = somente_replay
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    conteudo TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    ultimo_acesso REAL NOT NULL,
+                    PRIMARY KEY (namespace, chave)
+                )
+            """)
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+
+    def _conexao(self):
+        return conexao_wal(self.local, self.caminho)
+
+    @staticmethod
+    def chave(modelo, temperatura, messages):
+        """Chave da requisição: hash do modelo, da temperatura e das mensagens."""
+        requisicao = json.dumps(
+            {"modelo": modelo, "temperatura": temperatura, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(requisicao.encode("utf-8")).hexdigest()
+
+    def obter(self, chave):
+        """Retorna a resposta armazenada ou None.
+
+        No modo somente replay, a ausência da resposta gera RespostaNaoEncontradaError.
+        """
+        with self._conexao() as conexao:
+            linha = conexao.execute(
+                "SELECT conteudo FROM respostas WHERE namespace = ? AND chave = ?",
+                (self.namespace, chave),
+            ).fetchone()
+            if linha is not None:
+                conexao.execute(
+                    "UPDATE respostas SET ultimo_acesso = ? WHERE namespace = ? AND chave = ?",
+                    (time.time(), self.namespace, chave),
+                )
+                return linha[0]
+        if self.somente_replay:
+            raise RespostaNaoEncontradaError(
+                f"Resposta {chave[:12]} não encontrada no cache (namespace '{self.namespace}', modo somente replay)"
+            )
+        return None
+
+    def salvar(self, chave, conteudo):
+        """Armazena uma resposta e remove as menos usadas se o limite de tamanho for excedido."""
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, chave, conteudo, len(conteudo.encode("utf-8")), agora, agora),
+            )
+            self._remover_excedente(conexao)
+
+    def _remover_excedente(self, conexao):
+        """Remove as respostas acessadas há mais tempo até o cache caber no tamanho máximo."""
+        total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.tamanho_maximo:
+            return
+        removidas = 0
+        for namespace, chave, tamanho in conexao.execute(
+            "SELECT namespace, chave, tamanho FROM respostas ORDER BY ultimo_acesso"
+        ).fetchall():
+            if total <= self.tamanho_maximo:
+                break
+            conexao.execute("DELETE FROM respostas WHERE namespace = ? AND chave = ?", (namespace, chave))
+            total -= tamanho
+            removidas += 1
+        print(f"Cache de respostas: {removidas} respostas antigas removidas")
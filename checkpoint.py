@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+
+from cache_pdf import escrever_atomico
+
+# Checkpoints de versões anteriores (sem as entradas de cada item) são descartados
+VERSAO_MANIFESTO = 2
+
+
+class CheckpointRelatorio:
+    """Estado da geração de um relatório, gravado item a item em disco.
+
+    Cada item guarda as impressões digitais das entradas que consumiu (manifesto). Em uma
+    nova execução, só os itens cujas entradas mudaram precisam ser gerados novamente.
+    """
+
+    def __init__(self, nome_arquivo_pc, cache_dir="CACHE"):
+        self.caminho = os.path.join(cache_dir, "checkpoints", f"{nome_arquivo_pc}.json")
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        self.dados = self._carregar()
+
+    def _carregar(self):
+        """Lê o checkpoint; um arquivo ilegível ou de versão anterior é descartado."""
+        vazio = {"versao": VERSAO_MANIFESTO, "ucs": None, "itens": {}, "docx": None}
+        if not os.path.exists(self.caminho):
+            return vazio
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️ Checkpoint ilegível em {self.caminho}. Recomeçando o relatório...")
+            return vazio
+        if dados.get("versao") != VERSAO_MANIFESTO:
+            print("⚠️ Checkpoint sem o manifesto de entradas (versão anterior). Recomeçando o relatório...")
+            return vazio
+        return dados
+
+    def _salvar(self):
+        """Grava o checkpoint inteiro de forma atômica."""
+        escrever_atomico(self.caminho, json.dumps(self.dados, ensure_ascii=False, indent=1))
+
+    def item_reaproveitavel(self, numero_item, entradas):
+        """Conteúdo do item se ele foi gerado com sucesso a partir das mesmas entradas.
+
+        Retorna (conteúdo ou None, nomes das entradas que mudaram).
+        """
+        item = self.dados["itens"].get(str(numero_item))
+        if item is None or item.get("status") != "ok":
+            return None, []
+        anteriores = item.get("entradas", {})
+        mudancas = sorted(nome for nome in set(anteriores) | set(entradas) if anteriores.get(nome) != entradas.get(nome))
+        if mudancas:
+            return None, mudancas
+        return item["conteudo"], []
+
+    def ucs(self, entradas):
+        """Unidades Curriculares já extraídas das mesmas entradas, ou None."""
+        if self.dados.get("ucs_entradas") != entradas:
+            return None
+        return self.dados.get("ucs")
+
+    def salvar_ucs(self, ucs, entradas):
+        """Grava as Unidades Curriculares extraídas do documento PC."""
+        with self.lock:
+            self.dados["ucs"] = ucs
+            self.dados["ucs_entradas"] = entradas
+            self._salvar()
+
+    def salvar_item(self, numero_item, conteudo, metadados, entradas):
+        """Grava um item concluído (ou com falha) com seus tokens, latência, status e entradas."""
+        with self.lock:
+            self.dados["itens"][str(numero_item)] = dict(
+                metadados, conteudo=conteudo, entradas=entradas, concluido_em=time.time()
+            )
+            self._salvar()
+
+    def docx(self, impressao_relatorio):
+        """Caminho do DOCX já gerado para o mesmo texto de relatório, se o arquivo ainda existir."""
+        docx = self.dados.get("docx")
+        if docx and docx["impressao_relatorio"] == impressao_relatorio and os.path.exists(docx["caminho"]):
+            return docx["caminho"]
+        return None
+
+    def salvar_docx(self, impressao_relatorio, caminho):
+        """Grava o caminho do DOCX gerado a partir do texto do relatório."""
+        with self.lock:
+            self.dados["docx"] = {"impressao_relatorio": impressao_relatorio, "caminho": caminho}
+            self._salvar()
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# Quantidade de páginas extraídas por cada tarefa do pool de processos
+PAGINAS_POR_LOTE = 25
+
+
+def contar_paginas(caminho):
+    """Retorna o número de páginas de um PDF."""
+    # O pdfplumber só é importado quando há de fato um PDF a extrair (PDFs em cache não o carregam)
+    import pdfplumber
+    with pdfplumber.open(caminho) as pdf:
+        return len(pdf.pages)
+
+
+def extrair_intervalo(caminho, inicio, fim, destino, separador, limite_caracteres=None):
+    """Extrai as páginas [inicio, fim) de um PDF, gravando o texto de cada página no destino.
+
+    Retorna (caracteres gravados, True se todas as páginas do intervalo foram lidas).
+    """
+    import pdfplumber
+    caracteres = 0
+    with pdfplumber.open(caminho, pages=list(range(inicio + 1, fim + 1))) as pdf, \
+            open(destino, "w", encoding="utf-8") as saida:
+        for lidas, pagina in enumerate(pdf.pages, start=1):
+            conteudo = pagina.extract_text()
+            if conteudo:
+                saida.write(conteudo + separador)
+                caracteres += len(conteudo) + len(separador)
+            # Liberar os objetos da página assim que o texto for gravado
+            pagina.close()
+            if limite_caracteres is not None and caracteres >= limite_caracteres:
+                return caracteres, lidas == len(pdf.pages)
+    return caracteres, True
+
+
+def extrair_texto_pdf(caminho, destino, separador="\n\n", max_processos=None, limite_caracteres=None):
+    """Extrai o texto de um PDF para o arquivo de destino, em paralelo e na ordem das páginas.
+
+    As páginas são divididas em intervalos de PAGINAS_POR_LOTE; cada processo abre
+    o PDF por conta própria e grava seu intervalo em um arquivo parcial, que é
+    concatenado ao destino assim que todos os intervalos anteriores terminarem.
+    Com limite_caracteres, a extração para assim que o texto gravado atinge o limite.
+    Retorna (caracteres gravados, True se o documento inteiro foi extraído).
+    """
+    total_paginas = contar_paginas(caminho)
+    intervalos = [
+        (inicio, min(inicio + PAGINAS_POR_LOTE, total_paginas))
+        for inicio in range(0, total_paginas, PAGINAS_POR_LOTE)
+    ]
+    partes = [f"{destino}.parte{n}" for n in range(len(intervalos))]
+
+    # Documentos pequenos não compensam o custo de iniciar processos
+    if len(intervalos) <= 1:
+        print(f"  Processando {total_paginas} páginas")
+        return extrair_intervalo(caminho, 0, total_paginas, destino, separador, limite_caracteres)
+
+    max_processos = min(max_processos or os.cpu_count() or 1, len(intervalos))
+    print(f"  Processando {total_paginas} páginas em {len(intervalos)} lotes ({max_processos} processos)")
+    caracteres = 0
+    consumidos = 0
+    try:
+        # "spawn" evita herdar locks de outras threads do processo principal
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_processos, mp_context=contexto) as executor, \
+                open(destino, "w", encoding="utf-8") as saida:
+            # Os intervalos são enviados aos poucos para que a extração possa parar no limite
+            futuros = []
+            for n in range(min(max_processos, len(intervalos))):
+                futuros.append(executor.submit(extrair_intervalo, caminho, *intervalos[n], partes[n], separador))
+            while consumidos < len(intervalos):
+                caracteres += futuros[consumidos].result()[0]
+                with open(partes[consumidos], "r", encoding="utf-8") as entrada:
+                    shutil.copyfileobj(entrada, saida)
+                os.remove(partes[consumidos])
+                inicio, fim = intervalos[consumidos]
+                print(f"  Páginas {inicio + 1}-{fim}/{total_paginas} extraídas")
+                consumidos += 1
+                if limite_caracteres is not None and caracteres >= limite_caracteres:
+                    print(f"  Limite de {limite_caracteres} caracteres atingido; demais páginas ignoradas")
+                    for futuro in futuros[consumidos:]:
+                        futuro.cancel()
+                    break
+                if len(futuros) < len(intervalos):
+                    n = len(futuros)
+                    futuros.append(executor.submit(extrair_intervalo, caminho, *intervalos[n], partes[n], separador))
+    finally:
+        for parte in partes:
+            if os.path.exists(parte):
+                os.remove(parte)
+    return caracteres, consumidos == len(intervalos)
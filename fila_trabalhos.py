@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from cache_respostas import conexao_wal
+
+# Situações de um trabalho na fila
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+COLUNAS = ("id", "arquivo", "nome", "opcoes", "status", "criado_em", "iniciado_em", "concluido_em", "resultado", "erro", "tempos", "dono", "pulso")
+
+# O serviço renova o pulso dos seus trabalhos a cada INTERVALO_PULSO segundos; um trabalho
+# sem pulso há PRAZO_PULSO segundos é considerado abandonado (serviço encerrado ou travado)
+INTERVALO_PULSO = 10.0
+PRAZO_PULSO = 60.0
+
+
+def identificar_processo():
+    """Identificação do processo atual como dono de trabalhos ('host:pid')."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def processo_ativo(dono):
+    """Indica se o processo dono de um trabalho ainda pode estar em execução.
+
+    Só é possível verificar processos da mesma máquina (e fora do Windows, onde o sinal 0
+    interromperia o processo); nos demais casos vale apenas o prazo do pulso.
+    """
+    host, _, pid = (dono or "").rpartition(":")
+    if not host or not pid.isdigit():
+        return False
+    if host != socket.gethostname() or os.name == "nt":
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class FilaTrabalhos:
+    """Fila persistente de PCNs a revisar em SQLite (modo WAL), compartilhada entre processos.
+
+    Cada trabalho em execução registra o processo que o reservou (dono) e o último pulso
+    desse processo, para que outro serviço na mesma fila só recupere trabalhos abandonados.
+    """
+
+    def __init__(self, caminho="CACHE/trabalhos.sqlite3"):
+        self.caminho = caminho
+        self.dono = identificar_processo()
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS trabalhos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    arquivo TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    opcoes TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    iniciado_em REAL,
+                    concluido_em REAL,
+                    resultado TEXT,
+                    erro TEXT,
+                    tempos TEXT,
+                    dono TEXT,
+                    pulso REAL
+                )
+            """)
+            # Filas criadas antes do registro do dono ganham as novas colunas
+            existentes = {linha[1] for linha in conexao.execute("PRAGMA table_info(trabalhos)")}
+            for coluna, tipo in (("dono", "TEXT"), ("pulso", "REAL")):
+                if coluna not in existentes:
+                    conexao.execute(f"ALTER TABLE trabalhos ADD COLUMN {coluna} {tipo}")
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_status ON trabalhos (status, id)")
+
+    def _conexao(self):
+        return conexao_wal(self.local, self.caminho)
+
+    @staticmethod
+    def _trabalho(linha):
+        trabalho = dict(zip(COLUNAS, linha))
+        trabalho["opcoes"] = json.loads(trabalho["opcoes"])
+        trabalho["tempos"] = json.loads(trabalho["tempos"]) if trabalho["tempos"] else {}
+        return trabalho
+
+    def enfileirar(self, arquivo, opcoes=None):
+        """Acrescenta um PDF de PCN à fila e retorna o id do trabalho."""
+        arquivo = os.path.abspath(arquivo)
+        nome = os.path.basename(arquivo)
+        if nome.endswith(".pdf"):
+            nome = nome[:-4]
+        with self._conexao() as conexao:
+            cursor = conexao.execute(
+                "INSERT INTO trabalhos (arquivo, nome, opcoes, status, criado_em) VALUES (?, ?, ?, ?, ?)",
+                (arquivo, nome, json.dumps(opcoes or {}), PENDENTE, time.time()),
+            )
+            return cursor.lastrowid
+
+    def obter_proximo(self, ignorar_nomes=()):
+        """Reserva o trabalho pendente mais antigo e o retorna, ou None se não houver.
+
+        Trabalhos de PCNs em 'ignorar_nomes' ou em execução em qualquer serviço da fila
+        ficam na fila, pois dividiriam o mesmo checkpoint.
+        """
+        conexao = self._conexao()
+        # BEGIN IMMEDIATE impede que dois processos reservem o mesmo trabalho
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            marcadores = ",".join("?" for _ in ignorar_nomes)
+            linha = conexao.execute(
+                f"SELECT {', '.join(COLUNAS)} FROM trabalhos WHERE status = ? AND nome NOT IN ({marcadores}) "
+                "AND nome NOT IN (SELECT nome FROM trabalhos WHERE status = ?) ORDER BY id LIMIT 1",
+                (PENDENTE, *ignorar_nomes, EXECUTANDO),
+            ).fetchone()
+            if linha is None:
+                conexao.execute("COMMIT")
+                return None
+            trabalho = self._trabalho(linha)
+            trabalho["status"] = EXECUTANDO
+            trabalho["iniciado_em"] = trabalho["pulso"] = time.time()
+            trabalho["dono"] = self.dono
+            conexao.execute(
+                "UPDATE trabalhos SET status = ?, iniciado_em = ?, dono = ?, pulso = ? WHERE id = ?",
+                (EXECUTANDO, trabalho["iniciado_em"], self.dono, trabalho["pulso"], trabalho["id"]),
+            )
+            conexao.execute("COMMIT")
+            return trabalho
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def finalizar(self, id_trabalho, status, tempos, resultado=None, erro=None):
+        """Registra o fim de um trabalho (CONCLUIDO ou ERRO) com os tempos de cada etapa."""
+        with self._conexao() as conexao:
+            conexao.execute(
+                "UPDATE trabalhos SET status = ?, concluido_em = ?, resultado = ?, erro = ?, tempos = ? WHERE id = ?",
+                (status, time.time(), resultado, erro, json.dumps(tempos), id_trabalho),
+            )
+
+    def pulsar(self):
+        """Renova o pulso dos trabalhos em execução por este processo."""
+        with self._conexao() as conexao:
+            conexao.execute(
+                "UPDATE trabalhos SET pulso = ? WHERE status = ? AND dono = ?", (time.time(), EXECUTANDO, self.dono)
+            )
+
+    def recuperar_interrompidos(self, prazo=PRAZO_PULSO):
+        """Devolve à fila os trabalhos em execução cujo dono não está mais ativo.
+
+        O dono é considerado inativo se o processo não existe mais (mesma máquina) ou se
+        não renova o pulso há 'prazo' segundos. Trabalhos de outro serviço ainda ativo
+        na mesma fila não são tocados.
+        """
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            limite = time.time() - prazo
+            abandonados = [
+                id_trabalho
+                for id_trabalho, dono, pulso in conexao.execute(
+                    "SELECT id, dono, pulso FROM trabalhos WHERE status = ? AND (dono IS NULL OR dono != ?)",
+                    (EXECUTANDO, self.dono),
+                ).fetchall()
+                if pulso is None or pulso < limite or not processo_ativo(dono)
+            ]
+            conexao.executemany(
+                "UPDATE trabalhos SET status = ?, iniciado_em = NULL, dono = NULL, pulso = NULL WHERE id = ?",
+                [(PENDENTE, id_trabalho) for id_trabalho in abandonados],
+            )
+            conexao.execute("COMMIT")
+            return len(abandonados)
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+
+    def obter(self, id_trabalho):
+        """Trabalho com o id informado, ou None."""
+        linha = self._conexao().execute(
+            f"SELECT {', '.join(COLUNAS)} FROM trabalhos WHERE id = ?", (id_trabalho,)
+        ).fetchone()
+        return self._trabalho(linha) if linha is not None else None
+
+    def listar(self, limite=20):
+        """Trabalhos mais recentes, do mais novo para o mais antigo."""
+        return [
+            self._trabalho(linha)
+            for linha in self._conexao().execute(
+                f"SELECT {', '.join(COLUNAS)} FROM trabalhos ORDER BY id DESC LIMIT ?", (limite,)
+            ).fetchall()
+        ]
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from cache_pdf import escrever_atomico, hash_arquivo
+from orcamento_tokens import contar_tokens
+
+# Alterar a versão ou os parâmetros invalida os índices já gravados
+INDICE_VERSAO = "bm25-3"
+TAMANHO_TRECHO = 1500
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+PALAVRAS_IGNORADAS = set("""
+a ao aos as com como da das de do dos e em entre era essa esse esta este isso na nas no nos o os ou
+para pela pelas pelo pelos por que se sem ser sua suas seu seus sao sobre tambem uma um uns umas
+foi ha mais mas nao muito qual quando quem ja so lhe elas eles ela ele cada todo toda todos todas
+""".split())
+
+
+def tokenizar(texto):
+    """Converte o texto em termos normalizados (minúsculos, sem acentos e sem palavras vazias)."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return [termo for termo in re.findall(r"\w+", texto) if len(termo) > 2 and termo not in PALAVRAS_IGNORADAS]
+
+
+def dividir_em_trechos(nome_documento, texto):
+    """Divide um documento em trechos por página, com no máximo TAMANHO_TRECHO caracteres e seus tokens contados."""
+    trechos = []
+    for numero_pagina, pagina in enumerate(texto.split("\n\n"), start=1):
+        atual = ""
+        for linha in pagina.split("\n"):
+            if atual and len(atual) + len(linha) > TAMANHO_TRECHO:
+                trechos.append(_trecho(nome_documento, numero_pagina, atual))
+                atual = ""
+            atual += linha + "\n"
+        if atual.strip():
+            trechos.append(_trecho(nome_documento, numero_pagina, atual))
+    return trechos
+
+
+def _trecho(nome_documento, numero_pagina, texto):
+    texto = texto.strip()
+    return {"documento": nome_documento, "pagina": numero_pagina, "texto": texto, "tokens": contar_tokens(texto)}
+
+
+def chave_indice(caminhos):
+    """Chave do índice: conteúdo de todos os documentos base e parâmetros do índice."""
+    partes = [INDICE_VERSAO, str(TAMANHO_TRECHO)]
+    partes += sorted(hash_arquivo(caminho) for caminho in caminhos)
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
+
+class IndiceBase:
+    """Índice BM25 sobre trechos dos documentos base.
+
+    A lista invertida guarda, para cada termo, os trechos em que ele aparece e a
+    frequência em cada um: {termo: [[trechos], [frequências]]}.
+    """
+
+    def __init__(self, trechos, listas, tamanhos, chave=""):
+        self.trechos = trechos
+        self.listas = listas
+        self.tamanhos = tamanhos
+        self.chave = chave
+        self.tamanho_medio = sum(tamanhos) / max(len(tamanhos), 1)
+        # Parte da normalização BM25 que depende apenas do tamanho de cada trecho
+        self.normalizacoes = [
+            BM25_K1 * (1 - BM25_B + BM25_B * tamanho / self.tamanho_medio) for tamanho in tamanhos
+        ]
+
+    @classmethod
+    def construir(cls, documentos, chave=""):
+        """Constrói o índice a partir de {nome do documento: texto}."""
+        trechos = []
+        for nome, texto in documentos.items():
+            trechos += dividir_em_trechos(nome, texto)
+        listas = {}
+        tamanhos = []
+        for i, trecho in enumerate(trechos):
+            frequencia = Counter(tokenizar(trecho["texto"]))
+            tamanhos.append(sum(frequencia.values()))
+            for termo, tf in frequencia.items():
+                lista = listas.setdefault(termo, [[], []])
+                lista[0].append(i)
+                lista[1].append(tf)
+        return cls(trechos, listas, tamanhos, chave)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê um índice gravado com salvar()."""
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return cls(dados["trechos"], dados["listas"], dados["tamanhos"], dados["chave"])
+
+    def salvar(self, caminho):
+        """Grava o índice em disco de forma atômica."""
+        dados = {
+            "chave": self.chave,
+            "trechos": self.trechos,
+            "listas": self.listas,
+            "tamanhos": self.tamanhos,
+        }
+        escrever_atomico(caminho, json.dumps(dados, ensure_ascii=False))
+
+    def documentos(self):
+        """Nomes dos documentos indexados."""
+        return sorted({trecho["documento"] for trecho in self.trechos})
+
+    def pontuar(self, termos):
+        """Pontuação BM25 dos trechos que contêm algum termo da consulta: {índice do trecho: pontuação}.
+
+        Apenas as listas invertidas dos termos da consulta são percorridas.
+        """
+        total = len(self.trechos)
+        pontuacoes = {}
+        for termo in set(termos):
+            lista = self.listas.get(termo)
+            if not lista:
+                continue
+            df = len(lista[0])
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for i, tf in zip(*lista):
+                pontuacoes[i] = pontuacoes.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + self.normalizacoes[i])
+        return pontuacoes
+
+    def buscar(self, consulta, orcamento_tokens, max_trechos=12):
+        """Retorna os trechos mais relevantes que cabem no orçamento de tokens, já formatados."""
+        pontuacoes = self.pontuar(tokenizar(consulta))
+        # Empates ficam na ordem dos trechos nos documentos
+        ordem = sorted(pontuacoes, key=lambda i: (-pontuacoes[i], i))
+        selecionados = []
+        tokens_usados = 0
+        for i in ordem:
+            if pontuacoes[i] <= 0 or len(selecionados) >= max_trechos:
+                break
+            tokens = self.trechos[i]["tokens"]
+            if tokens_usados + tokens > orcamento_tokens:
+                continue
+            selecionados.append(self.trechos[i])
+            tokens_usados += tokens
+        return "\n\n".join(
+            f"[{trecho['documento']}, p. {trecho['pagina']}]\n{trecho['texto']}" for trecho in selecionados
+        )
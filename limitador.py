@@ -0,0 +1,86 @@
+import threading
+import time
+
+# Cota usada quando api_config.py não define RPM_LIMITE/TPM_LIMITE
+RPM_PADRAO = 300
+TPM_PADRAO = 50000
+
+# Fração mínima da cota configurada usada após sucessivos erros 429
+FATOR_MINIMO = 0.25
+
+
+class LimitadorTaxa:
+    """Balde de tokens compartilhado que limita requisições e tokens por minuto."""
+
+    def __init__(self, requisicoes_por_minuto, tokens_por_minuto):
+        self.capacidade_requisicoes = float(requisicoes_por_minuto)
+        self.capacidade_tokens = float(tokens_por_minuto)
+        self.requisicoes = self.capacidade_requisicoes
+        self.tokens = self.capacidade_tokens
+        self.ultima_reposicao = time.monotonic()
+        self.condicao = threading.Condition()
+        # Fração da cota em uso: reduzida a cada 429 e recuperada aos poucos a cada sucesso
+        self.fator = 1.0
+        self.pausado_ate = 0.0
+
+    def _repor(self):
+        """Repõe o balde proporcionalmente ao tempo decorrido."""
+        agora = time.monotonic()
+        decorrido = agora - self.ultima_reposicao
+        self.ultima_reposicao = agora
+        self.requisicoes = min(self.capacidade_requisicoes, self.requisicoes + decorrido * self.fator * self.capacidade_requisicoes / 60)
+        self.tokens = min(self.capacidade_tokens, self.tokens + decorrido * self.fator * self.capacidade_tokens / 60)
+
+    def adquirir(self, tokens_estimados):
+        """Bloqueia até haver cota para uma requisição com a quantidade de tokens estimada."""
+        # Uma requisição maior que a cota inteira nunca caberia no balde
+        tokens_estimados = min(tokens_estimados, self.capacidade_tokens)
+        with self.condicao:
+            while True:
+                pausa = self.pausado_ate - time.monotonic()
+                if pausa > 0:
+                    self.condicao.wait(pausa)
+                    continue
+                self._repor()
+                if self.requisicoes >= 1 and self.tokens >= tokens_estimados:
+                    self.requisicoes -= 1
+                    self.tokens -= tokens_estimados
+                    return
+                espera = max(
+                    (1 - self.requisicoes) * 60 / (self.fator * self.capacidade_requisicoes),
+                    (tokens_estimados - self.tokens) * 60 / (self.fator * self.capacidade_tokens),
+                )
+                self.condicao.wait(max(espera, 0.05))
+
+    def ajustar(self, tokens_estimados, tokens_reais):
+        """Corrige o balde com o consumo real informado pela API."""
+        with self.condicao:
+            self.tokens = min(self.capacidade_tokens, self.tokens + tokens_estimados - tokens_reais)
+            self.condicao.notify_all()
+
+    def pausar(self, segundos):
+        """Suspende todas as requisições pelo tempo indicado (ex.: disjuntor aberto)."""
+        with self.condicao:
+            self._repor()
+            self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+            # Evita uma rajada de requisições acumuladas quando a pausa terminar
+            self.requisicoes = min(self.requisicoes, 1.0)
+
+    def reduzir(self):
+        """Reduz o ritmo após um erro 429 (redução multiplicativa)."""
+        with self.condicao:
+            self._repor()
+            self.fator = max(FATOR_MINIMO, self.fator * 0.75)
+
+    def recuperar(self):
+        """Recupera o ritmo gradualmente após uma chamada bem-sucedida (aumento aditivo)."""
+        with self.condicao:
+            if self.fator < 1.0:
+                self._repor()
+                self.fator = min(1.0, self.fator + 0.02)
+
+
+def estimar_tokens(messages, tokens_saida=1500):
+    """Estima os tokens de uma requisição (aproximadamente 4 caracteres por token)."""
+    caracteres = sum(len(mensagem["content"]) for mensagem in messages)
+    return caracteres // 4 + tokens_saida
@@ -0,0 +1,181 @@
+import datetime
+import io
+import json
+import os
+import threading
+import time
+import uuid
+
+# Endpoint das requisições no arquivo de lote (Azure OpenAI)
+ENDPOINT_LOTE = "/chat/completions"
+JANELA_CONCLUSAO = "24h"
+
+# Intervalo entre consultas ao estado do lote, em segundos
+INTERVALO_CONSULTA = 60
+
+# Limite de requisições por arquivo de entrada da Batch API
+MAX_REQUISICOES_POR_ARQUIVO = 50000
+
+# Requisições em lote custam metade do preço das requisições síncronas
+DESCONTO_LOTE = 0.5
+
+ESTADOS_FINAIS = {"completed", "failed", "expired", "cancelled"}
+
+
+def linha_requisicao(id_requisicao, modelo, temperatura, messages):
+    """Linha JSONL de uma requisição de chat no formato da Batch API."""
+    return json.dumps({
+        "custom_id": id_requisicao,
+        "method": "POST",
+        "url": ENDPOINT_LOTE,
+        "body": {"model": modelo, "messages": messages, "temperature": temperatura},
+    }, ensure_ascii=False)
+
+
+def ler_resultados(texto):
+    """Converte o JSONL de saída (ou de erros) de um lote em {id: (conteúdo ou None, metadados)}."""
+    resultados = {}
+    for linha in texto.splitlines():
+        if not linha.strip():
+            continue
+        registro = json.loads(linha)
+        resposta = registro.get("response") or {}
+        corpo = resposta.get("body") or {}
+        if registro.get("error") or resposta.get("status_code") != 200 or not corpo.get("choices"):
+            erro = registro.get("error") or corpo.get("error") or f"status {resposta.get('status_code')}"
+            resultados[registro["custom_id"]] = (None, {"status": "erro", "erro": str(erro)})
+            continue
+        uso = corpo.get("usage") or {}
+        detalhes = uso.get("prompt_tokens_details") or {}
+        resultados[registro["custom_id"]] = (corpo["choices"][0]["message"]["content"].strip(), {
+            "status": "ok",
+            "tokens_prompt": uso.get("prompt_tokens", 0),
+            "tokens_resposta": uso.get("completion_tokens", 0),
+            "tokens_cache": detalhes.get("cached_tokens") or 0,
+        })
+    return resultados
+
+
+def executar_lote(client, requisicoes, modelo, temperatura, diretorio="CACHE/lotes", intervalo_consulta=INTERVALO_CONSULTA):
+    """Envia {id: messages} pela Batch API, aguarda a conclusão e devolve os resultados.
+
+    Os resultados seguem o formato de ler_resultados; requisições sem resposta (lote
+    expirado, cancelado ou com falha) voltam com status 'erro'.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    ids = list(requisicoes)
+    resultados = {}
+    for inicio in range(0, len(ids), MAX_REQUISICOES_POR_ARQUIVO):
+        parte = ids[inicio:inicio + MAX_REQUISICOES_POR_ARQUIVO]
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        caminho = os.path.join(diretorio, f"{timestamp}_{uuid.uuid4().hex[:8]}.jsonl")
+        with open(caminho, "w", encoding="utf-8") as f:
+            for id_requisicao in parte:
+                f.write(linha_requisicao(id_requisicao, modelo, temperatura, requisicoes[id_requisicao]) + "\n")
+
+        with open(caminho, "rb") as f:
+            arquivo = client.files.create(file=f, purpose="batch")
+        # A Azure processa o arquivo enviado antes de aceitar o lote
+        while getattr(arquivo, "status", "processed") not in ("processed", "error"):
+            time.sleep(min(intervalo_consulta, 5))
+            arquivo = client.files.retrieve(arquivo.id)
+        if arquivo.status == "error":
+            raise RuntimeError(f"Arquivo de lote {caminho} rejeitado: {getattr(arquivo, 'status_details', '')}")
+
+        lote = client.batches.create(
+            input_file_id=arquivo.id,
+            endpoint=ENDPOINT_LOTE,
+            completion_window=JANELA_CONCLUSAO,
+        )
+        print(f"Lote {lote.id} enviado com {len(parte)} requisições")
+        while lote.status not in ESTADOS_FINAIS:
+            time.sleep(intervalo_consulta)
+            lote = client.batches.retrieve(lote.id)
+            contagem = lote.request_counts
+            if contagem is not None:
+                print(f" Lote {lote.id}: {lote.status} ({contagem.completed}/{contagem.total} concluídas, {contagem.failed} com falha)")
+        print(f"Lote {lote.id} finalizado com estado '{lote.status}'")
+
+        for id_arquivo in (lote.output_file_id, lote.error_file_id):
+            if id_arquivo:
+                resultados.update(ler_resultados(client.files.content(id_arquivo).text))
+        for id_requisicao in parte:
+            if id_requisicao not in resultados:
+                resultados[id_requisicao] = (None, {"status": "erro", "erro": f"sem resposta no lote ({lote.status})"})
+    return resultados
+
+
+class _Objeto:
+    """Objeto simples com atributos, no formato das respostas do SDK."""
+
+    def __init__(self, **atributos):
+        self.__dict__.update(atributos)
+
+
+class ClienteLoteLocal:
+    """Substituto local dos endpoints de arquivos e de lotes, para testes e execuções offline.
+
+    Cada requisição do lote é executada com client.chat.completions.create de um cliente
+    síncrono (real ou simulado), e os resultados ficam disponíveis no formato da Batch API.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.arquivos = {}
+        self.lotes = {}
+        self.lock = threading.Lock()
+        self.files = _Objeto(create=self._criar_arquivo, retrieve=self._obter_arquivo, content=self._conteudo_arquivo)
+        self.batches = _Objeto(create=self._criar_lote, retrieve=self._obter_lote)
+
+    def _novo_arquivo(self, conteudo):
+        with self.lock:
+            id_arquivo = f"file-{uuid.uuid4().hex[:12]}"
+            self.arquivos[id_arquivo] = conteudo
+        return _Objeto(id=id_arquivo, status="processed")
+
+    def _criar_arquivo(self, file, purpose):
+        return self._novo_arquivo(file.read().decode("utf-8"))
+
+    def _obter_arquivo(self, id_arquivo):
+        return _Objeto(id=id_arquivo, status="processed")
+
+    def _conteudo_arquivo(self, id_arquivo):
+        return _Objeto(text=self.arquivos[id_arquivo])
+
+    def _criar_lote(self, input_file_id, endpoint, completion_window):
+        saida, erros = io.StringIO(), io.StringIO()
+        linhas = [json.loads(linha) for linha in self.arquivos[input_file_id].splitlines() if linha.strip()]
+        concluidas = falhas = 0
+        for requisicao in linhas:
+            corpo = requisicao["body"]
+            try:
+                resposta = self.client.chat.completions.create(
+                    model=corpo["model"], messages=corpo["messages"], temperature=corpo.get("temperature")
+                )
+                uso = resposta.usage
+                detalhes = getattr(uso, "prompt_tokens_details", None) if uso else None
+                registro = {"status_code": 200, "body": {
+                    "choices": [{"message": {"role": "assistant", "content": resposta.choices[0].message.content}}],
+                    "usage": {
+                        "prompt_tokens": uso.prompt_tokens if uso else 0,
+                        "completion_tokens": uso.completion_tokens if uso else 0,
+                        "prompt_tokens_details": {"cached_tokens": getattr(detalhes, "cached_tokens", 0) or 0},
+                    },
+                }}
+                saida.write(json.dumps({"custom_id": requisicao["custom_id"], "response": registro, "error": None}) + "\n")
+                concluidas += 1
+            except Exception as e:
+                erros.write(json.dumps({"custom_id": requisicao["custom_id"], "response": None, "error": {"message": str(e)}}) + "\n")
+                falhas += 1
+        lote = _Objeto(
+            id=f"batch-{uuid.uuid4().hex[:12]}",
+            status="completed",
+            output_file_id=self._novo_arquivo(saida.getvalue()).id if concluidas else None,
+            error_file_id=self._novo_arquivo(erros.getvalue()).id if falhas else None,
+            request_counts=_Objeto(total=len(linhas), completed=concluidas, failed=falhas),
+        )
+        self.lotes[lote.id] = lote
+        return lote
+
+    def _obter_lote(self, id_lote):
+        return self.lotes[id_lote]
@@ -1,80 +1,431 @@
 import os
+import re
+import sys
+import time
+import glob
+import argparse
 import datetime
-import pdfplumber
-from openai import AzureOpenAI
+import hashlib
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import api_config
 from api_config import API_KEY, ENDPOINT, API_VERSION
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.enum.table import WD_TABLE_ALIGNMENT
-
-client = AzureOpenAI(
-    azure_endpoint=ENDPOINT,
-    api_key=API_KEY,
-    api_version=API_VERSION
+from limitador import LimitadorTaxa, estimar_tokens, RPM_PADRAO, TPM_PADRAO
+from retentativas import (
+    Disjuntor, classificar_erro, tempo_retry_after, calcular_espera,
+    MAX_TENTATIVAS_LIMITE, MAX_TENTATIVAS_TRANSITORIAS
 )
+from agendador import processar_lote
+from cache_pdf import obter_cache, escrever_atomico, CONFIG_EXTRACAO
+from extracao_pdf import extrair_texto_pdf
+from cache_respostas import CacheRespostas, RespostaNaoEncontradaError
+from checkpoint import CheckpointRelatorio
+from indice_base import IndiceBase, chave_indice
+from secoes_prompt import montar_prompt_comum, montar_prompt_especifico
+from telemetria import telemetria, estimar_custo
+from lote_api import executar_lote, ClienteLoteLocal, DESCONTO_LOTE, INTERVALO_CONSULTA
+from orcamento_tokens import recortar_documento, verificar_contexto, contar_tokens, contar_tokens_mensagens, tokens_entrada_disponiveis
 
-def ler_pdf(caminho, cache_dir="CACHE"):
-    """Lê o conteúdo de um arquivo PDF e retorna o texto."""
-    # Verificar se já existe no cache 
+# O openai, o python-docx e o pdfplumber só são importados pelas etapas que os usam,
+# para que extract, render e --dry-run iniciem rápido e sem carregar o cliente HTTP
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def obter_cliente():
+    """Cliente do Azure OpenAI, criado na primeira vez em que é necessário."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            from openai import AzureOpenAI
+            # As novas tentativas são feitas por chamar_gpt, que classifica os erros
+            _cliente = AzureOpenAI(
+                azure_endpoint=ENDPOINT,
+                api_key=API_KEY,
+                api_version=API_VERSION,
+                max_retries=0
+            )
+    return _cliente
+
+# Limite de taxa compartilhado por todas as chamadas do processo
+# (cópias locais antigas de api_config.py não definem a cota e usam a padrão)
+limitador = LimitadorTaxa(
+    getattr(api_config, "RPM_LIMITE", RPM_PADRAO),
+    getattr(api_config, "TPM_LIMITE", TPM_PADRAO)
+)
+disjuntor = Disjuntor(limitador)
+
+# Modelo e temperatura usados em todas as chamadas
+MODELO = "gpt-4o"
+TEMPERATURA = 0.5
+
+# Cache persistente de respostas da API (configurado em main)
+cache_respostas = None
+
+# Itens do relatório são recebidos em streaming e gravados aos poucos em CACHE/parciais (configurado em main)
+usar_streaming = True
+
+# Número do último item do relatório (a resposta dele vai até o fim)
+ULTIMO_ITEM = 24
+
+# Número máximo de chamadas simultâneas à API durante a geração de um relatório
+MAX_CONCORRENCIA = 6
+
+# Tokens de cada documento enviados ao modelo (o recorte termina antes de uma UC ou no fim de uma página)
+ORCAMENTO_TOKENS_PC = 10000
+ORCAMENTO_TOKENS_DOCUMENTO_BASE = 30000
+ORCAMENTO_TOKENS_PROMPT_ESTRUTURA = 18000
+
+# Caracteres extraídos de cada PDF: uma folga sobre o orçamento de tokens, que faz o recorte final
+LIMITE_PC = ORCAMENTO_TOKENS_PC * 6
+LIMITE_BASE = ORCAMENTO_TOKENS_DOCUMENTO_BASE * 6
+
+# Tokens dos documentos base recuperados pelo índice para cada item
+ORCAMENTO_TOKENS_BASE = 8000
+MAX_TRECHOS_BASE = 12
+
+# Itens que recebem a lista de Unidades Curriculares
+ITENS_COM_UCS = [2, 3, 6, 7, 8, 9, 10]
+
+# Itens de justificativa, que dependem do item imediatamente anterior (o item justificado)
+ITENS_JUSTIFICATIVA = [12, 14, 16, 18, 20]
+
+# Itens relacionados gerados em uma única chamada com saída estruturada (modo --agrupar)
+GRUPOS_ITENS = [(7, 8, 9, 10), (11, 12), (13, 14), (15, 16), (17, 18), (19, 20)]
+
+# Itens com uma tabela por UC, gerados com uma requisição por UC (modo --por-uc)
+ITENS_POR_UC = [2, 3, 6, 7, 8, 9, 10]
+MAX_CONCORRENCIA_UC = 12
+# Rodadas de requisição das UCs que ficaram sem linhas na tabela
+MAX_RODADAS_UC = 2
+
+# Tokens de resposta estimados por item no plano do --dry-run
+TOKENS_RESPOSTA_ESTIMADOS = 1500
+# O cache de prefixo do provedor só vale para prefixos a partir deste tamanho
+TOKENS_MINIMOS_CACHE_PREFIXO = 1024
+
+# Subcomandos da linha de comando
+COMANDOS = ("extract", "generate", "render", "run", "serve", "submit", "status")
+
+# Mensagem de sistema igual para todos os itens (faz parte do prefixo reaproveitado pelo cache do provedor)
+MENSAGEM_SISTEMA_ITEM = "Você é um especialista em educação profissional do Senac. Gere APENAS o item do relatório solicitado na última mensagem, conforme as regras do prompt."
+
+def ler_pdf(caminho, cache_dir="CACHE", reconstruir=False, limite_caracteres=None):
+    """Lê o conteúdo de um arquivo PDF e retorna o texto.
+    
+    Com limite_caracteres, a extração para nas primeiras páginas que atingem o limite.
+    """
     nome_arquivo = os.path.basename(caminho)
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-        
-    cache_path = os.path.join(cache_dir, f"{nome_arquivo}.txt")
+    with telemetria.span("ler_pdf", arquivo=nome_arquivo) as span:
+        # Verificar se já existe no cache (chave: conteúdo do arquivo + versão do extrator)
+        cache = obter_cache(cache_dir)
+        chave = cache.chave(caminho)
     
-    if os.path.exists(cache_path):
-        print(f"Usando cache para {nome_arquivo}")
-        with open(cache_path, "r", encoding="utf-8") as f:
-            return f.read()
+        if not reconstruir:
+            texto = cache.obter(chave, limite_caracteres)
+            if texto is not None:
+                print(f"Usando cache para {nome_arquivo}")
+                span.update(cache=True, caracteres=len(texto))
+                return texto
     
-    print(f"Extraindo texto de {nome_arquivo}...")
-    texto = ""
-    try:
-        with pdfplumber.open(caminho) as pdf:
-            total_paginas = len(pdf.pages)
-            for i, pagina in enumerate(pdf.pages):
-                if i % 20 == 0:  # Mostrar progresso a cada 20 páginas
-                    print(f"  Processando página {i+1}/{total_paginas}")
-                conteudo = pagina.extract_text()
-                if conteudo:
-                    texto += conteudo + "\n\n"
+        print(f"Extraindo texto de {nome_arquivo}...")
+        temporario = cache.novo_temporario()
+        try:
+            # As páginas são extraídas em paralelo e gravadas em ordem direto no arquivo do cache
+            _, completo = extrair_texto_pdf(
+                caminho,
+                temporario,
+                separador=CONFIG_EXTRACAO["separador_paginas"],
+                limite_caracteres=limite_caracteres
+            )
         
-        # Salvar no cache
-        with open(cache_path, "w", encoding="utf-8") as f:
-            f.write(texto)
-            
-        return texto
-    except Exception as e:
-        print(f"Erro ao processar {nome_arquivo}: {str(e)}")
-        return f"ERRO NA EXTRAÇÃO: {str(e)}"
+            # Salvar no cache (falhas não são gravadas e serão tentadas de novo na próxima execução)
+            cache.registrar(chave, temporario, caminho, completo=completo)
+        
+            with open(cache.caminho_texto(chave, parcial=not completo), "r", encoding="utf-8") as f:
+                texto = f.read()
+            span.update(cache=False, caracteres=len(texto), completo=completo)
+            return texto
+        except Exception as e:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            print(f"Erro ao processar {nome_arquivo}: {str(e)}")
+            span.update(status="erro", erro=str(e))
+            return f"ERRO NA EXTRAÇÃO: {str(e)}"
+
+def carregar_indice_base(base_dir, arquivos_base, reconstruir=False, cache_dir="CACHE"):
+    """Carrega o índice de busca dos documentos base, construindo-o na primeira execução."""
+    caminhos = [os.path.join(base_dir, arquivo) for arquivo in arquivos_base]
+    chave = chave_indice(caminhos)
+    caminho_indice = os.path.join(cache_dir, f"indice_base_{chave[:16]}.json")
+    
+    if not reconstruir and os.path.exists(caminho_indice):
+        print(f"Usando índice dos documentos base ({len(arquivos_base)} documentos)")
+        return IndiceBase.carregar(caminho_indice)
+    
+    print(f"Construindo índice dos documentos base ({len(arquivos_base)} documentos)...")
+    documentos = {}
+    for arquivo, caminho in zip(arquivos_base, caminhos):
+        texto = ler_pdf(caminho, cache_dir=cache_dir, reconstruir=reconstruir)
+        if texto.startswith("ERRO NA EXTRAÇÃO"):
+            print(f"⚠️ {arquivo} ignorado no índice")
+            continue
+        documentos[arquivo] = texto
+        print(f"Documento base lido: {arquivo} ({len(texto)} caracteres)")
+    
+    indice = IndiceBase.construir(documentos, chave)
+    os.makedirs(cache_dir, exist_ok=True)
+    indice.salvar(caminho_indice)
+    print(f" Índice construído: {len(indice.trechos)} trechos")
+    return indice
 
 def ler_prompt(caminho):
     """Lê o conteúdo do arquivo de prompt."""
     with open(caminho, "r", encoding="utf-8") as arquivo:
         return arquivo.read()
 
-def chamar_gpt(messages, max_tentativas=3):
-    """Chama a API com retry em caso de falha."""
-    for tentativa in range(max_tentativas):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.5 
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Erro na chamada à API (tentativa {tentativa+1}): {str(e)}")
-            if tentativa == max_tentativas - 1:
-                raise
-            import time
-            time.sleep(5)  # Espera 5 segundos antes de tentar novamente
+def configurar_cache_respostas(namespace="padrao", somente_replay=False, ativo=True):
+    """Ativa o cache persistente de respostas para as próximas chamadas à API."""
+    global cache_respostas
+    cache_respostas = CacheRespostas(namespace=namespace, somente_replay=somente_replay) if ativo else None
+
+def marcadores_parada(numero_item):
+    """Marcadores que encerram a resposta de um item: o cabeçalho do item seguinte.
+    
+    Subtítulos de nível 2 dentro do item (ex.: "## 5.1. Detalhamento") não encerram a resposta.
+    """
+    return (f"\n## {numero_item + 1}. ",) if numero_item < ULTIMO_ITEM else ()
+
+def receber_stream(resposta, arquivo_parcial, parar_em=(), inicio=None, cortar_apos=None):
+    """Lê uma resposta em streaming, acrescentando cada trecho ao arquivo parcial.
+    
+    A leitura é interrompida no primeiro marcador de parar_em; com cortar_apos (o título do
+    item), só valem os marcadores posteriores a ele. Os últimos caracteres recebidos só são
+    gravados quando não podem mais ser o início de um marcador. Retorna o conteúdo, o uso
+    de tokens (None se o stream foi interrompido antes do fim) e o tempo até o primeiro token.
+    """
+    if inicio is None:
+        inicio = time.monotonic()
+    os.makedirs(os.path.dirname(arquivo_parcial), exist_ok=True)
+    reserva = max((len(marcador) for marcador in parar_em), default=1) - 1
+    conteudo = ""
+    gravado = 0
+    inicio_busca = 0 if cortar_apos is None else None
+    uso = None
+    tempo_primeiro_token = None
+    with open(arquivo_parcial, "w", encoding="utf-8") as f:
+        for chunk in resposta:
+            if chunk.usage:
+                uso = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if tempo_primeiro_token is None:
+                tempo_primeiro_token = time.monotonic() - inicio
+            # O marcador pode começar no fim do trecho anterior
+            busca_a_partir = max(0, len(conteudo) - reserva)
+            conteudo += chunk.choices[0].delta.content
+            if inicio_busca is None:
+                posicao = conteudo.find(cortar_apos)
+                if posicao != -1:
+                    inicio_busca = posicao + len(cortar_apos)
+            corte = -1
+            if inicio_busca is not None:
+                busca_a_partir = max(busca_a_partir, inicio_busca)
+                corte = min((posicao for posicao in (conteudo.find(marcador, busca_a_partir) for marcador in parar_em) if posicao != -1), default=-1)
+            if corte != -1:
+                f.write(conteudo[gravado:corte])
+                conteudo = conteudo[:corte]
+                if hasattr(resposta, "close"):
+                    resposta.close()
+                break
+            if len(conteudo) - reserva > gravado:
+                f.write(conteudo[gravado:len(conteudo) - reserva])
+                gravado = len(conteudo) - reserva
+                f.flush()
+        else:
+            f.write(conteudo[gravado:])
+    return conteudo.strip(), uso, tempo_primeiro_token
+
+def chamar_gpt(messages, max_tentativas_limite=MAX_TENTATIVAS_LIMITE, max_tentativas_transitorias=MAX_TENTATIVAS_TRANSITORIAS, metadados=None, arquivo_parcial=None, parar_em=(), formato_resposta=None, ignorar_cache=False, cortar_apos=None):
+    """Chama a API com retry em caso de falha.
+    
+    Erros 429 e falhas transitórias têm orçamentos de tentativas separados e esperam com
+    backoff exponencial (ou o Retry-After do servidor); erros permanentes, como 400, não
+    são repetidos. Com arquivo_parcial, a resposta é recebida em streaming, gravada aos
+    poucos nesse arquivo e encerrada no primeiro marcador de parar_em posterior a cortar_apos
+    (o mesmo marcador é enviado como stop à API). formato_resposta é
+    repassado como response_format (ex.: JSON schema). Se metadados for um dicionário, ele recebe os tokens consumidos, a latência, o tempo até o primeiro
+    token, o número de tentativas e se a resposta veio do cache; se o stream for encerrado
+    antes de a API informar o uso, os tokens são contados localmente (uso_estimado). Com
+    ignorar_cache (itens pedidos em --regenerar), a resposta armazenada não é usada, mas a nova é gravada.
+    """
+    if metadados is None:
+        metadados = {}
+    with telemetria.span("chamar_gpt", modelo=MODELO) as span:
+        inicio = time.monotonic()
+        chave = None
+        if cache_respostas is not None:
+            chave = cache_respostas.chave(MODELO, TEMPERATURA, messages)
+            # No modo somente replay a API nunca é chamada, mesmo com ignorar_cache
+            conteudo = cache_respostas.obter(chave) if not ignorar_cache or cache_respostas.somente_replay else None
+            if conteudo is not None:
+                metadados.update(cache=True, tentativas=0, latencia=time.monotonic() - inicio)
+                span.update(metadados)
+                return conteudo
+    
+        # Mensagens que não cabem no contexto falhariam com erro 400 sem nem chegar ao modelo
+        tokens_entrada = span["tokens_entrada"] = verificar_contexto(messages, MODELO)
+        tokens_estimados = estimar_tokens(messages)
+        orcamento = {"limite": max_tentativas_limite, "transitorio": max_tentativas_transitorias}
+        falhas = {"limite": 0, "transitorio": 0}
+        tentativa = 0
+        while True:
+            tentativa += 1
+            try:
+                limitador.adquirir(tokens_estimados)
+                inicio_chamada = time.monotonic()
+                parametros = {}
+                if parar_em:
+                    parametros["stop"] = list(parar_em)
+                if formato_resposta is not None:
+                    parametros["response_format"] = formato_resposta
+                if arquivo_parcial is None:
+                    response = obter_cliente().chat.completions.create(
+                        model=MODELO,
+                        messages=messages,
+                        temperature=TEMPERATURA,
+                        **parametros
+                    )
+                    conteudo = response.choices[0].message.content.strip()
+                    uso = response.usage
+                else:
+                    response = obter_cliente().chat.completions.create(
+                        model=MODELO,
+                        messages=messages,
+                        temperature=TEMPERATURA,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **parametros
+                    )
+                    conteudo, uso, tempo_primeiro_token = receber_stream(response, arquivo_parcial, parar_em, inicio_chamada, cortar_apos)
+                    metadados["tempo_primeiro_token"] = tempo_primeiro_token
+                disjuntor.registrar_sucesso()
+                metadados.update(cache=False, tentativas=tentativa, erros_429=falhas["limite"], latencia=time.monotonic() - inicio)
+                if uso:
+                    detalhes = uso.prompt_tokens_details
+                    tokens_prompt, tokens_resposta = uso.prompt_tokens, uso.completion_tokens
+                    tokens_cache = (detalhes.cached_tokens or 0) if detalhes else 0
+                else:
+                    # Stream encerrado no marcador antes do uso informado pela API: usa a contagem local
+                    tokens_prompt, tokens_resposta, tokens_cache = tokens_entrada, contar_tokens(conteudo), 0
+                    metadados["uso_estimado"] = True
+                limitador.ajustar(tokens_estimados, tokens_prompt + tokens_resposta)
+                metadados.update(
+                    tokens_prompt=tokens_prompt,
+                    tokens_resposta=tokens_resposta,
+                    tokens_cache=tokens_cache,
+                    custo=estimar_custo(MODELO, tokens_prompt, tokens_resposta, tokens_cache)
+                )
+                span.update(metadados)
+                if chave is not None:
+                    cache_respostas.salvar(chave, conteudo)
+                return conteudo
+            except Exception as e:
+                tipo = classificar_erro(e)
+                print(f"Erro na chamada à API (tentativa {tentativa}, {tipo}): {str(e)}")
+                if tipo == "permanente" or falhas[tipo] >= orcamento[tipo]:
+                    span.update(tentativas=tentativa, erros_429=falhas["limite"])
+                    raise
+                falhas[tipo] += 1
+                retry_after = tempo_retry_after(e)
+                if tipo == "limite":
+                    disjuntor.registrar_limite(retry_after)
+                time.sleep(calcular_espera(falhas[tipo], retry_after))
+
+# Estrutura usada quando não é possível obtê-la do prompt
+ESTRUTURA_PADRAO = """1. Cabeçalho
+2. Tabela de Impacto por cada Unidade Curricular (UC)
+3. Tabela com propostas de novos nomes para cada UC
+4. Perfil Profissional de Conclusão
+5. Sugestões de Atualizações para o Perfil Profissional de Conclusão
+6. Tabela Comparativa de Carga Horária por cada UC
+7. Tabela com alterações dos “Indicadores” de cada competência/Unidade Curricular (UC)
+8. Tabela com alterações dos “Conhecimentos” de cada competência/Unidade Curricular (UC)
+9. Tabela com alterações das “Habilidades” de cada competência/Unidade Curricular (UC)
+10. Tabela com alterações das “Atitudes/Valores” de cada competência/Unidade Curricular (UC)
+11. Principal tipo de tecnologias que impactam as competências da profissão
+12. Justificativa da resposta do item 11 (Principal tipo de tecnologias que impactam as competências da profissão)
+13. Principal tipo de impacto nas competências da profissão
+14. Justificativa da resposta do item 13 (Principal tipo de impacto nas competências da profissão)
+15. O PCN deve ser Mantido, Atualizado ou Descontinuado?
+16. Justificativa da resposta do item 15 (PCN deve ser Mantido, Atualizado ou Descontinuado?).
+17. Qual o horizonte de atualização do PCN (caso a resposta do item 13 seja ‘Atualizado’)?
+18. Justificativa da resposta do item 17 (horizonte de atualização do PCN).
+19. Sugestão do nome de novo curso (caso seja sugerida a descontinuidade do PCN avaliado no item 13)
+20. Justificativa da resposta do item 19 (Sugestão do nome de novo curso).
+21. Sugestões para atualização de PTDs
+22. Projeto Integrador
+23. Instalações, Equipamentos e Recursos Didáticos
+24. Tabela de referências
+"""
+
+_estruturas_em_memoria = {}
+
+def analisar_estrutura_prompt(prompt_texto):
+    """Lê os títulos dos 24 itens diretamente do bloco <24 ITENS DO RELATÓRIO> do prompt."""
+    inicio = prompt_texto.find("<24 ITENS DO RELATÓRIO>")
+    fim = prompt_texto.find("</24 ITENS DO RELATÓRIO>")
+    if inicio == -1 or fim == -1:
+        return {}
+    
+    estrutura = {}
+    for linha in prompt_texto[inicio:fim].split('\n'):
+        correspondencia = re.match(r"^##\s*(\d+)\.\s*(.+?)[\s:]*$", linha)
+        if correspondencia and correspondencia.group(1) not in estrutura:
+            estrutura[correspondencia.group(1)] = correspondencia.group(2)
+    return estrutura
 
-def extrair_estrutura_relatorio(prompt_texto):
-    """Extrai a estrutura do relatório a partir do prompt."""
+def extrair_estrutura_relatorio(prompt_texto, usar_llm=False, cache_dir="CACHE"):
+    """Extrai a estrutura do relatório a partir do prompt.
+    
+    A estrutura é lida de forma determinística do prompt e memorizada em disco pelo
+    hash do prompt. O modelo só é consultado se usar_llm=True (--estrutura-llm) e a
+    leitura falhar; a estrutura padrão usada na falta de ambos não é gravada em disco,
+    para que uma execução com --estrutura-llm ainda consulte o modelo.
+    """
+    hash_prompt = hashlib.sha256(prompt_texto.encode("utf-8")).hexdigest()
+    if hash_prompt in _estruturas_em_memoria:
+        return _estruturas_em_memoria[hash_prompt]
+    
+    cache_path = os.path.join(cache_dir, f"estrutura_{hash_prompt[:16]}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            estrutura = f.read()
+        _estruturas_em_memoria[hash_prompt] = estrutura
+        return estrutura
+    
     print("Extraindo estrutura do relatório...")
+    itens = analisar_estrutura_prompt(prompt_texto)
+    print(f"  → {len(itens)} itens identificados no prompt")
+    
+    if len(itens) == 24:
+        estrutura = "\n".join(f"{numero}. {titulo}" for numero, titulo in itens.items()) + "\n"
+    elif usar_llm:
+        print("  ⚠️ Estrutura incompleta no prompt. Consultando o modelo...")
+        estrutura = extrair_estrutura_relatorio_llm(prompt_texto)
+    else:
+        print("  ⚠️ Estrutura incompleta no prompt. Usando estrutura padrão")
+        estrutura = ESTRUTURA_PADRAO
     
+    if estrutura != ESTRUTURA_PADRAO:
+        os.makedirs(cache_dir, exist_ok=True)
+        escrever_atomico(cache_path, estrutura)
+    _estruturas_em_memoria[hash_prompt] = estrutura
+    return estrutura
+
+def extrair_estrutura_relatorio_llm(prompt_texto):
+    """Extrai a estrutura do relatório a partir do prompt usando o modelo."""
     mensagens = [
         {"role": "system", "content": "Você é um pedagogo especialista em Educação Profissional do setor secundário (Comércio de Bens e Serviços). Sua tarefa é identificar a estrutura proposta de um relatório de análise de Plano de Curso Nacional a partir de um prompt."},
         {"role": "user", "content": f"""
@@ -82,7 +433,7 @@ Analise o prompt abaixo e liste APENAS os títulos dos 24 itens que devem compor
 Forneça apenas a numeração e o título de cada item, sem explicações adicionais.
 
 PROMPT:
-{prompt_texto[:60000]}
+{recortar_documento(prompt_texto, ORCAMENTO_TOKENS_PROMPT_ESTRUTURA, "Prompt")}
 
 Formato esperado:
 1. Título do Item 1
@@ -102,76 +453,25 @@ Formato esperado:
         print(f"  → {num_itens} itens identificados na estrutura")
         
         if num_itens < 15:  # Se não conseguiu extrair ao menos 15 itens, algo está errado
-            print("  ⚠️ Poucos itens identificados. Tentando abordagem alternativa...")
-            # Tente uma abordagem mais direta
-            estrutura = """1. Cabeçalho
-2. Tabela de Impacto por cada Unidade Curricular (UC)
-3. Tabela com propostas de novos nomes para cada UC
-4. Perfil Profissional de Conclusão
-5. Sugestões de Atualizações para o Perfil Profissional de Conclusão
-6. Tabela Comparativa de Carga Horária por cada UC
-7. Tabela com alterações dos “Indicadores” de cada competência/Unidade Curricular (UC)
-8. Tabela com alterações dos “Conhecimentos” de cada competência/Unidade Curricular (UC)
-9. Tabela com alterações das “Habilidades” de cada competência/Unidade Curricular (UC)
-10. 10. Tabela com alterações das “Atitudes/Valores” de cada competência/Unidade Curricular (UC)
-11. Principal tipo de tecnologias que impactam as competências da profissão
-12. Justificativa da resposta do item 11 (Principal tipo de tecnologias que impactam as competências da profissão)
-13. Principal tipo de impacto nas competências da profissão
-14. Justificativa da resposta do item 13 (Principal tipo de impacto nas competências da profissão)
-15. O PCN deve ser Mantido, Atualizado ou Descontinuado?
-16. Justificativa da resposta do item 15 (PCN deve ser Mantido, Atualizado ou Descontinuado?).
-17. Qual o horizonte de atualização do PCN (caso a resposta do item 13 seja ‘Atualizado’)?
-18.Justificativa da resposta do item 176 (horizonte de atualização do PCN).
-19. Sugestão do nome de novo curso (caso seja sugerida a descontinuidade do PCN avaliado no item 13)
-20. Justificativa da resposta do item 19 (Sugestão do nome de novo curso).
-21. Sugestões para atualização de PTDs
-22. Projeto Integrador
-23. Instalações, Equipamentos e Recursos Didáticos
-24. Tabela de referências
-"""
+            print("  ⚠️ Poucos itens identificados. Usando estrutura padrão...")
+            estrutura = ESTRUTURA_PADRAO
         
         return estrutura
     except Exception as e:
         print(f"Erro ao extrair estrutura: {str(e)}")
         # Retornar uma estrutura padrão em caso de falha
-        return """1. Cabeçalho
-2. Tabela de Impacto por cada Unidade Curricular (UC)
-3. Tabela com propostas de novos nomes para cada UC
-4. Perfil Profissional de Conclusão
-5. Sugestões de Atualizações para o Perfil Profissional de Conclusão
-6. Tabela Comparativa de Carga Horária por cada UC
-7. Tabela com alterações dos “Indicadores” de cada competência/Unidade Curricular (UC)
-8. Tabela com alterações dos “Conhecimentos” de cada competência/Unidade Curricular (UC)
-9. Tabela com alterações das “Habilidades” de cada competência/Unidade Curricular (UC)
-10. 10. Tabela com alterações das “Atitudes/Valores” de cada competência/Unidade Curricular (UC)
-11. Principal tipo de tecnologias que impactam as competências da profissão
-12. Justificativa da resposta do item 11 (Principal tipo de tecnologias que impactam as competências da profissão)
-13. Principal tipo de impacto nas competências da profissão
-14. Justificativa da resposta do item 13 (Principal tipo de impacto nas competências da profissão)
-15. O PCN deve ser Mantido, Atualizado ou Descontinuado?
-16. Justificativa da resposta do item 15 (PCN deve ser Mantido, Atualizado ou Descontinuado?).
-17. Qual o horizonte de atualização do PCN (caso a resposta do item 13 seja ‘Atualizado’)?
-18.Justificativa da resposta do item 176 (horizonte de atualização do PCN).
-19. Sugestão do nome de novo curso (caso seja sugerida a descontinuidade do PCN avaliado no item 13)
-20. Justificativa da resposta do item 19 (Sugestão do nome de novo curso).
-21. Sugestões para atualização de PTDs
-22. Projeto Integrador
-23. Instalações, Equipamentos e Recursos Didáticos
-24. Tabela de referências
-"""
+        return ESTRUTURA_PADRAO
 
-def extrair_unidades_curriculares(documento_pc):
-    """Extrai a lista de Unidades Curriculares do documento."""
-    print("Extraindo Unidades Curriculares do documento...")
-    
-    mensagens = [
+def montar_mensagens_ucs(documento_pc):
+    """Monta as mensagens da requisição que extrai as Unidades Curriculares do documento."""
+    return [
         {"role": "system", "content": "Você é um pedagogo especialista em Educação Profissional do setor secundário (Comércio de Bens e Serviços). Identifique precisamente as Unidades Curriculares listadas no documento."},
         {"role": "user", "content": f"""
 Analise o documento abaixo e extraia APENAS a lista completa de Unidades Curriculares (UCs) mencionadas.
 Para cada UC, forneça o número e o nome/título exato como aparece no documento.
 
 DOCUMENTO:
-{documento_pc[:30000]}
+{recortar_documento(documento_pc, ORCAMENTO_TOKENS_PC, "Documento PC")}
 
 Formato esperado:
 UC1: [Nome da UC1]
@@ -179,30 +479,70 @@ UC2: [Nome da UC2]
 ...
 """}
     ]
+
+def extrair_unidades_curriculares(documento_pc, metadados=None):
+    """Extrai a lista de Unidades Curriculares do documento."""
+    if metadados is None:
+        metadados = {}
+    print("Extraindo Unidades Curriculares do documento...")
     
     try:
-        ucs = chamar_gpt(mensagens)
+        ucs = chamar_gpt(montar_mensagens_ucs(documento_pc), metadados=metadados)
+        metadados["status"] = "ok"
         print(" Unidades Curriculares extraídas com sucesso")
         return ucs
+    except RespostaNaoEncontradaError:
+        raise
     except Exception as e:
+        metadados.update(status="erro", erro=str(e))
         print(f"Erro ao extrair UCs: {str(e)}")
         return "Não foi possível extrair as Unidades Curriculares automaticamente."
 
-def gerar_item_relatorio(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None):
-    """Gera um item específico do relatório."""
-    print(f"Gerando item {numero_item}: {titulo_item}...")
+def montar_prefixo_mensagens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, indice_base=None):
+    """Mensagens iniciais, idênticas em todos os itens do PCN.
+    
+    Vêm primeiro para aproveitar o cache de prefixo do provedor; o que muda de um
+    item para outro fica na última mensagem.
+    """
+    prefixo = f"""PROMPT ORIGINAL (regras gerais):
+{montar_prompt_comum(prompt_texto)}
+
+DOCUMENTO PC ("{nome_arquivo_pc}"):
+{recortar_documento(documento_pc, ORCAMENTO_TOKENS_PC, f"Documento PC {nome_arquivo_pc}")}
+"""
+    if indice_base is None:
+        # Sem índice, o documento base enviado é o mesmo para todos os itens
+        nome_base, documento_base = next(iter(documentos_base.items()))
+        prefixo += f"""
+DOCUMENTOS DE REFERÊNCIA:
+{recortar_documento(documento_base, ORCAMENTO_TOKENS_DOCUMENTO_BASE, f"Documento base {nome_base}")}
+"""
+    return [
+        {"role": "system", "content": MENSAGEM_SISTEMA_ITEM},
+        {"role": "user", "content": prefixo},
+    ]
+
+def buscar_trechos_base(numero_item, titulo_item, documento_pc, ucs, indice_base):
+    """Trechos dos documentos base relevantes ao título do item, às UCs e ao início do PC."""
+    consulta = f"{titulo_item}\n{ucs if numero_item in ITENS_COM_UCS else ''}\n{documento_pc[:2000]}"
+    return indice_base.buscar(consulta, ORCAMENTO_TOKENS_BASE, MAX_TRECHOS_BASE)
+
+def montar_detalhes_item(numero_item, titulo_item, prompt_texto, documento_pc, ucs, itens_anteriores=None, indice_base=None, trechos_base=None):
+    """Instruções, contexto, referências e seções do prompt exclusivas de um item.
     
+    Com indice_base, o item recebe apenas os trechos dos documentos base relevantes
+    ao seu título, às UCs e ao PC, em vez do início do primeiro documento base.
+    trechos_base evita uma nova busca quando os trechos do item já foram recuperados.
+    """
     # Preparar as instruções específicas com base no número do item
     instrucoes_especificas = ""
     contexto_anterior = ""
     
-    # Adicionar contexto de itens anteriores quando relevante
-    if itens_anteriores and numero_item > 9:
-        # Para justificativas, incluir o item que está sendo justificado
-        if numero_item in [10, 12, 14, 16, 18]:
-            item_referencia = numero_item - 1
-            if str(item_referencia) in itens_anteriores:
-                contexto_anterior = f"Item {item_referencia} (que você está justificando): {itens_anteriores[str(item_referencia)]}\n\n"
+    # Para justificativas, incluir o item que está sendo justificado
+    if itens_anteriores and numero_item in ITENS_JUSTIFICATIVA:
+        item_referencia = numero_item - 1
+        if str(item_referencia) in itens_anteriores:
+            contexto_anterior = f"Item {item_referencia} (que você está justificando): {itens_anteriores[str(item_referencia)]}\n\n"
                 
     
     # Instruções específicas por tipo de item
@@ -218,7 +558,7 @@ IMPORTANTE:
         instrucoes_especificas = """
 Forneça apenas a resposta direta conforme as opções permitidas, sem explicações adicionais.
 """
-    elif numero_item in [12, 14, 16, 18, 20]:  # Itens de justificativa
+    elif numero_item in ITENS_JUSTIFICATIVA:  # Itens de justificativa
         instrucoes_especificas = """
 Forneça uma justificativa detalhada em texto por extenso com aproximadamente 2.000 caracteres.
 """
@@ -254,49 +594,390 @@ Inserir as demandas por equipamentos e recursos necessários à implementação
         """
     
     # Adicionar informações sobre UCs quando relevante
-    if numero_item in [2, 3, 6, 7, 8, 9, 10]:
+    if numero_item in ITENS_COM_UCS:
         instrucoes_especificas += f"\n\nUNIDADES CURRICULARES DO CURSO:\n{ucs}\n"
     
-    mensagens = [
-        {"role": "system", "content": f"Você é um especialista em educação profissional do Senac. Gere APENAS o item {numero_item} do relatório conforme solicitado."},
-        {"role": "user", "content": f"""
-Gere APENAS o item {numero_item} ({titulo_item}) do relatório para o PCN "{nome_arquivo_pc}", seguindo exatamente o formato solicitado.
+    # Trechos dos documentos de referência recuperados para o item (sem índice, eles ficam no prefixo)
+    referencias_item = ""
+    if indice_base is not None:
+        if trechos_base is None:
+            trechos_base = buscar_trechos_base(numero_item, titulo_item, documento_pc, ucs, indice_base)
+        referencias_item = f"""
+DOCUMENTOS DE REFERÊNCIA:
+Documentos disponíveis: {', '.join(indice_base.documentos())}
 
-{contexto_anterior}
+{trechos_base}
+"""
+    
+    return f"""{contexto_anterior}
 {instrucoes_especificas}
 
 ESTRUTURA DO RELATÓRIO:
 Item {numero_item}: {titulo_item}
+{referencias_item}
+PROMPT ORIGINAL (seções deste item):
+{montar_prompt_especifico(prompt_texto, numero_item)}
+"""
 
-DOCUMENTO PC:
-{documento_pc[:30000]}
+def montar_mensagens_item(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, indice_base=None, trechos_base=None):
+    """Monta as mensagens da requisição de um item do relatório."""
+    detalhes = montar_detalhes_item(
+        numero_item, titulo_item, prompt_texto, documento_pc, ucs,
+        itens_anteriores=itens_anteriores, indice_base=indice_base, trechos_base=trechos_base
+    )
+    return montar_prefixo_mensagens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, indice_base) + [
+        {"role": "user", "content": f"""
+Gere APENAS o item {numero_item} ({titulo_item}) do relatório para o PCN "{nome_arquivo_pc}", seguindo exatamente o formato solicitado.
 
-DOCUMENTOS DE REFERÊNCIA:
-{next(iter(documentos_base.values()))[:100000]}
+{detalhes}
+Forneça apenas o conteúdo do item {numero_item}, começando com o título "## {numero_item}. {titulo_item}".
+"""}
+    ]
 
-PROMPT ORIGINAL:
-{prompt_texto[:500000]}
+def ajustar_titulo_item(numero_item, titulo_item, conteudo_item):
+    """Acrescenta o título do item à resposta quando o modelo não o incluiu."""
+    if not conteudo_item.startswith(f"## {numero_item}.") and not conteudo_item.startswith(f"##{numero_item}."):
+        conteudo_item = f"## {numero_item}. {titulo_item}\n\n{conteudo_item}"
+    return conteudo_item
 
-Forneça apenas o conteúdo do item {numero_item}, começando com o título "## {numero_item}. {titulo_item}".
+def gerar_item_relatorio(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, metadados=None, indice_base=None, ignorar_cache=False, trechos_base=None):
+    """Gera um item específico do relatório (com ignorar_cache, sem usar o cache de respostas)."""
+    if metadados is None:
+        metadados = {}
+    print(f"Gerando item {numero_item}: {titulo_item}...")
+    
+    mensagens = montar_mensagens_item(
+        numero_item, titulo_item, prompt_texto, documentos_base, documento_pc,
+        nome_arquivo_pc, ucs, itens_anteriores=itens_anteriores, indice_base=indice_base, trechos_base=trechos_base
+    )
+    
+    # O item é recebido em streaming e gravado aos poucos, para acompanhar os itens longos
+    arquivo_parcial = None
+    if usar_streaming:
+        arquivo_parcial = os.path.join("CACHE", "parciais", nome_arquivo_pc, f"item_{numero_item:02d}.md")
+    
+    with telemetria.span("gerar_item_relatorio", pcn=nome_arquivo_pc, item=numero_item) as span:
+        try:
+            conteudo_item = chamar_gpt(
+                mensagens, metadados=metadados, arquivo_parcial=arquivo_parcial, parar_em=marcadores_parada(numero_item),
+                ignorar_cache=ignorar_cache, cortar_apos=f"## {numero_item}."
+            )
+            metadados["status"] = "ok"
+            # Verificar se o título está presente e adicionar se necessário
+            conteudo_item = ajustar_titulo_item(numero_item, titulo_item, conteudo_item)
+        
+            print(f" Item {numero_item} gerado com sucesso")
+            return conteudo_item
+        except RespostaNaoEncontradaError:
+            raise
+        except Exception as e:
+            metadados.update(status="erro", erro=str(e))
+            print(f"Erro ao gerar item {numero_item}: {str(e)}")
+            return f"## {numero_item}. {titulo_item}\n\nNão foi possível gerar este item automaticamente."
+        finally:
+            span.update(metadados)
+
+def montar_mensagens_grupo(grupo, estrutura, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, indice_base=None, trechos_itens=None):
+    """Monta as mensagens da requisição que gera vários itens relacionados de uma vez.
+    
+    trechos_itens traz os trechos dos documentos base já recuperados, por número do item.
+    """
+    trechos_itens = trechos_itens or {}
+    pedidos = ""
+    for numero_item in grupo:
+        detalhes = montar_detalhes_item(
+            numero_item, estrutura[str(numero_item)], prompt_texto, documento_pc, ucs,
+            itens_anteriores=itens_anteriores, indice_base=indice_base, trechos_base=trechos_itens.get(numero_item)
+        )
+        pedidos += f"\n=== ITEM {numero_item}: {estrutura[str(numero_item)]} ===\n{detalhes}"
+    numeros = ", ".join(str(numero_item) for numero_item in grupo)
+    return montar_prefixo_mensagens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, indice_base) + [
+        {"role": "user", "content": f"""
+Gere APENAS os itens {numeros} do relatório para o PCN "{nome_arquivo_pc}", seguindo exatamente o formato solicitado para cada um.
+As justificativas devem justificar as respostas dadas nos itens correspondentes deste mesmo pedido.
+{pedidos}
+Responda em JSON com um campo "item_N" para cada item, contendo o conteúdo do item em markdown, começando com o título "## N. Título".
 """}
     ]
+
+def esquema_grupo(grupo):
+    """Formato de resposta (JSON schema estrito) com um campo de texto por item do grupo."""
+    campos = [f"item_{numero_item}" for numero_item in grupo]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "itens_relatorio_" + "_".join(str(numero_item) for numero_item in grupo),
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {campo: {"type": "string"} for campo in campos},
+                "required": campos,
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def validar_resposta_grupo(resposta, grupo, estrutura):
+    """Converte a resposta JSON de um grupo em {número: markdown}; gera ValueError se for inválida."""
+    dados = json.loads(resposta)
+    if not isinstance(dados, dict):
+        raise ValueError("a resposta não é um objeto JSON")
+    itens = {}
+    for numero_item in grupo:
+        conteudo = dados.get(f"item_{numero_item}")
+        if not isinstance(conteudo, str) or not conteudo.strip():
+            raise ValueError(f"item {numero_item} ausente ou vazio")
+        if numero_item in ITENS_COM_UCS and "|" not in conteudo:
+            raise ValueError(f"item {numero_item} sem a tabela solicitada")
+        itens[numero_item] = ajustar_titulo_item(numero_item, estrutura[str(numero_item)], conteudo.strip())
+    return itens
+
+def gerar_grupo_relatorio(grupo, estrutura, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, indice_base=None, ignorar_cache=False, trechos_itens=None):
+    """Gera itens relacionados em uma única chamada com saída estruturada.
     
-    try:
-        conteudo_item = chamar_gpt(mensagens)
-        # Verificar se o título está presente e adicionar se necessário
-        if not conteudo_item.startswith(f"## {numero_item}.") and not conteudo_item.startswith(f"##{numero_item}."):
-            conteudo_item = f"## {numero_item}. {titulo_item}\n\n{conteudo_item}"
+    Se a chamada falhar ou a resposta não passar na validação, os itens são gerados
+    um a um. Retorna {número: conteúdo} e {número: metadados}.
+    """
+    rotulo = f"{grupo[0]}-{grupo[-1]}"
+    print(f"Gerando itens {rotulo} em uma única chamada...")
+    mensagens = montar_mensagens_grupo(
+        grupo, estrutura, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs,
+        itens_anteriores=itens_anteriores, indice_base=indice_base, trechos_itens=trechos_itens
+    )
+    metadados = {}
+    with telemetria.span("gerar_grupo_relatorio", pcn=nome_arquivo_pc, grupo=rotulo, itens=list(grupo)) as span:
+        try:
+            itens = validar_resposta_grupo(
+                chamar_gpt(mensagens, metadados=metadados, formato_resposta=esquema_grupo(grupo), ignorar_cache=ignorar_cache),
+                grupo,
+                estrutura
+            )
+            metadados["status"] = "ok"
+            span.update(metadados)
+            print(f" Itens {rotulo} gerados com sucesso")
+            return itens, {numero_item: dict(metadados, grupo=rotulo) for numero_item in grupo}
+        except RespostaNaoEncontradaError:
+            raise
+        except Exception as e:
+            span.update(metadados, status="erro", erro=str(e))
+            print(f"⚠️ Falha ao gerar os itens {rotulo} juntos ({str(e)}). Gerando um a um...")
+    
+    # Os itens são gerados em ordem, para que cada justificativa receba o item justificado
+    itens = {}
+    metadados_itens = {}
+    anteriores = dict(itens_anteriores or {})
+    for numero_item in grupo:
+        metadados_itens[numero_item] = {}
+        itens[numero_item] = gerar_item_relatorio(
+            numero_item, estrutura[str(numero_item)], prompt_texto, documentos_base, documento_pc,
+            nome_arquivo_pc, ucs, itens_anteriores=anteriores, metadados=metadados_itens[numero_item],
+            indice_base=indice_base, ignorar_cache=ignorar_cache, trechos_base=(trechos_itens or {}).get(numero_item)
+        )
+        anteriores[str(numero_item)] = itens[numero_item]
+    return itens, metadados_itens
+
+def listar_ucs(ucs):
+    """Converte a lista de UCs extraída ('UC1: Nome') em [(rótulo, nome)]."""
+    lista = []
+    for linha in (ucs or "").split("\n"):
+        encontrado = re.match(r"^[\s*\-]*(UC\s*\d+)\s*[:\-–]\s*(.+?)\s*$", linha, re.IGNORECASE)
+        if encontrado:
+            lista.append((re.sub(r"\s+", "", encontrado.group(1)).upper(), encontrado.group(2).strip("* ")))
+    return lista
+
+def montar_mensagens_item_uc(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, uc, itens_anteriores=None, indice_base=None, repeticao=False, trechos_base=None):
+    """Monta as mensagens que pedem apenas as linhas da tabela de um item referentes a uma UC.
+    
+    trechos_base são os trechos dos documentos base recuperados para o item inteiro,
+    os mesmos em todas as UCs (e no manifesto do checkpoint).
+    """
+    rotulo, nome = uc
+    detalhes = montar_detalhes_item(
+        numero_item, titulo_item, prompt_texto, documento_pc, f"{rotulo}: {nome}",
+        itens_anteriores=itens_anteriores, indice_base=indice_base, trechos_base=trechos_base
+    )
+    aviso = ""
+    if repeticao:
+        # Muda a requisição (e a chave do cache de respostas) depois de uma resposta sem tabela
+        aviso = "\nATENÇÃO: a resposta anterior para esta UC não trouxe a tabela. Responda obrigatoriamente com a tabela markdown.\n"
+    return montar_prefixo_mensagens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, indice_base) + [
+        {"role": "user", "content": f"""
+Gere APENAS o item {numero_item} ({titulo_item}) do relatório para o PCN "{nome_arquivo_pc}", somente da {rotulo} ({nome}).
+As demais UCs são geradas em outras requisições, com as mesmas colunas.
+
+{detalhes}{aviso}
+Forneça apenas a tabela markdown (cabeçalho, linha separadora e as linhas da {rotulo}), sem título e sem explicações.
+"""}
+    ]
+
+def juntar_tabelas_ucs(respostas, ucs_lista):
+    """Junta as tabelas por UC em uma única tabela markdown, na ordem das UCs.
+    
+    O cabeçalho mais frequente entre as respostas é usado e as linhas são ajustadas
+    ao seu número de colunas. Retorna a tabela e os rótulos das UCs sem linhas.
+    """
+    tabelas = {rotulo: processar_tabela_markdown(resposta) for rotulo, resposta in respostas.items() if resposta}
+    cabecalhos = Counter(tuple(colunas) for colunas, dados in tabelas.values() if colunas and dados)
+    if not cabecalhos:
+        return "", [rotulo for rotulo, _ in ucs_lista]
+    colunas = list(cabecalhos.most_common(1)[0][0])
+    
+    linhas = []
+    ausentes = []
+    for rotulo, nome in ucs_lista:
+        dados = tabelas.get(rotulo, ([], []))[1]
+        if not dados:
+            ausentes.append(rotulo)
+            dados = [[f"{rotulo}: {nome}", "Não foi possível gerar as linhas desta UC automaticamente."]]
+        for linha in dados:
+            linha = (linha + [""] * len(colunas))[:len(colunas)]
+            linhas.append("| " + " | ".join(linha) + " |")
+    tabela = "\n".join(
+        ["| " + " | ".join(colunas) + " |", "|" + "|".join("---" for _ in colunas) + "|"] + linhas
+    )
+    return tabela, ausentes
+
+def gerar_item_por_uc(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, metadados=None, indice_base=None, ignorar_cache=False, trechos_base=None):
+    """Gera um item de tabela por UC com uma requisição por UC, em paralelo.
+    
+    As linhas de cada UC são juntadas em uma única tabela e as UCs que ficaram sem
+    linhas são pedidas novamente (até MAX_RODADAS_UC rodadas). Sem uma lista de UCs
+    utilizável, o item é gerado em uma única chamada.
+    """
+    if metadados is None:
+        metadados = {}
+    ucs_lista = listar_ucs(ucs)
+    if len(ucs_lista) < 2:
+        return gerar_item_relatorio(
+            numero_item, titulo_item, prompt_texto, documentos_base, documento_pc,
+            nome_arquivo_pc, ucs, itens_anteriores=itens_anteriores, metadados=metadados, indice_base=indice_base,
+            ignorar_cache=ignorar_cache, trechos_base=trechos_base
+        )
+    print(f"Gerando item {numero_item}: {titulo_item} ({len(ucs_lista)} UCs em paralelo)...")
+    # Os trechos dos documentos base são buscados uma vez para o item, não uma vez por UC
+    if indice_base is not None and trechos_base is None:
+        trechos_base = buscar_trechos_base(numero_item, titulo_item, documento_pc, ucs, indice_base)
+    
+    respostas = {}
+    metadados_ucs = []
+    
+    def gerar_uc(uc, repeticao):
+        metadados_uc = {}
+        metadados_ucs.append(metadados_uc)
+        with telemetria.span("gerar_linhas_uc", pcn=nome_arquivo_pc, item=numero_item, uc=uc[0]) as span:
+            try:
+                mensagens = montar_mensagens_item_uc(
+                    numero_item, titulo_item, prompt_texto, documentos_base, documento_pc,
+                    nome_arquivo_pc, uc, itens_anteriores=itens_anteriores, indice_base=indice_base,
+                    repeticao=repeticao, trechos_base=trechos_base
+                )
+                return chamar_gpt(mensagens, metadados=metadados_uc, ignorar_cache=ignorar_cache)
+            except RespostaNaoEncontradaError:
+                raise
+            except Exception as e:
+                metadados_uc.update(status="erro", erro=str(e))
+                print(f"Erro ao gerar a {uc[0]} do item {numero_item}: {str(e)}")
+                return None
+            finally:
+                span.update(metadados_uc)
+    
+    with telemetria.span("gerar_item_por_uc", pcn=nome_arquivo_pc, item=numero_item) as span:
+        pendentes = ucs_lista
+        with ThreadPoolExecutor(max_workers=min(len(ucs_lista), MAX_CONCORRENCIA_UC)) as executor:
+            for rodada in range(MAX_RODADAS_UC):
+                for uc, resposta in zip(pendentes, executor.map(gerar_uc, pendentes, [rodada > 0] * len(pendentes))):
+                    if resposta and processar_tabela_markdown(resposta)[1]:
+                        respostas[uc[0]] = resposta
+                tabela, ausentes = juntar_tabelas_ucs(respostas, ucs_lista)
+                pendentes = [uc for uc in ucs_lista if uc[0] in ausentes]
+                if not pendentes:
+                    break
+                print(f"  → Item {numero_item}: {len(pendentes)} UCs sem linhas na tabela ({', '.join(ausentes)})")
         
-        print(f" Item {numero_item} gerado com sucesso")
-        return conteudo_item
-    except Exception as e:
-        print(f"Erro ao gerar item {numero_item}: {str(e)}")
-        return f"## {numero_item}. {titulo_item}\n\nNão foi possível gerar este item automaticamente."
+        # Os metadados do item somam os das requisições; a latência é a da UC mais lenta
+        metadados.update(
+            cache=all(m.get("cache") for m in metadados_ucs),
+            tentativas=sum(m.get("tentativas", 0) for m in metadados_ucs),
+            erros_429=sum(m.get("erros_429", 0) for m in metadados_ucs),
+            latencia=max((m.get("latencia", 0) for m in metadados_ucs), default=0),
+            tokens_prompt=sum(m.get("tokens_prompt", 0) for m in metadados_ucs),
+            tokens_resposta=sum(m.get("tokens_resposta", 0) for m in metadados_ucs),
+            tokens_cache=sum(m.get("tokens_cache", 0) for m in metadados_ucs),
+            custo=sum(m.get("custo", 0) for m in metadados_ucs),
+            requisicoes=len(metadados_ucs),
+            ucs=len(ucs_lista),
+            ucs_ausentes=ausentes,
+        )
+        if not tabela:
+            metadados.update(status="erro", erro="nenhuma UC gerou linhas na tabela")
+            span.update(metadados)
+            print(f"Erro ao gerar item {numero_item}: nenhuma UC gerou linhas na tabela")
+            return f"## {numero_item}. {titulo_item}\n\nNão foi possível gerar este item automaticamente."
+        metadados["status"] = "ok"
+        span.update(metadados)
+    
+    print(f" Item {numero_item} gerado com sucesso ({len(ucs_lista) - len(ausentes)}/{len(ucs_lista)} UCs)")
+    return f"## {numero_item}. {titulo_item}\n\n{tabela}"
 
-def gerar_relatorio_completo(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc):
-    """Gera o relatório completo com todos os 24 itens garantidos."""
-    print("Iniciando geração do relatório completo por itens...")
+def dependencias_item(numero_item):
+    """Retorna os itens dos quais um item depende e se ele precisa das UCs."""
+    dependencias = []
+    if numero_item in ITENS_JUSTIFICATIVA:
+        dependencias.append(numero_item - 1)
+    return dependencias, numero_item in ITENS_COM_UCS
+
+def impressao_digital(*partes):
+    """SHA-256 das partes de texto, usado como impressão digital de uma entrada."""
+    return hashlib.sha256("\0".join(partes).encode("utf-8")).hexdigest()
+
+def entradas_ucs(documento_pc, nome_arquivo_pc):
+    """Impressões digitais das entradas da extração das Unidades Curriculares."""
+    return {
+        "modelo": impressao_digital(MODELO, str(TEMPERATURA)),
+        "pc": impressao_digital(recortar_documento(documento_pc, ORCAMENTO_TOKENS_PC, f"Documento PC {nome_arquivo_pc}")),
+    }
+
+def entradas_item(numero_item, titulo_item, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs, itens_anteriores=None, indice_base=None, trechos_base=None):
+    """Impressões digitais das entradas consumidas por um item (manifesto do checkpoint).
     
+    Cobrem as seções do prompt enviadas ao item, o texto do PC, os trechos dos documentos
+    base (trechos_base, ou o documento base recortado, sem índice), as UCs e os itens dos quais ele depende.
+    """
+    entradas = {
+        "modelo": impressao_digital(MODELO, str(TEMPERATURA)),
+        "prompt": impressao_digital(titulo_item, montar_prompt_comum(prompt_texto), montar_prompt_especifico(prompt_texto, numero_item)),
+        "pc": impressao_digital(recortar_documento(documento_pc, ORCAMENTO_TOKENS_PC, f"Documento PC {nome_arquivo_pc}")),
+    }
+    if indice_base is not None:
+        if trechos_base is None:
+            trechos_base = buscar_trechos_base(numero_item, titulo_item, documento_pc, ucs, indice_base)
+        entradas["base"] = impressao_digital(trechos_base)
+    elif documentos_base:
+        nome_base, documento_base = next(iter(documentos_base.items()))
+        entradas["base"] = impressao_digital(recortar_documento(documento_base, ORCAMENTO_TOKENS_DOCUMENTO_BASE, f"Documento base {nome_base}"))
+    dependencias, precisa_ucs = dependencias_item(numero_item)
+    if precisa_ucs:
+        entradas["ucs"] = impressao_digital(ucs or "")
+    for dependencia in dependencias:
+        if itens_anteriores and str(dependencia) in itens_anteriores:
+            entradas[f"item_{dependencia}"] = impressao_digital(itens_anteriores[str(dependencia)])
+    return entradas
+
+def reaproveitar_item(checkpoint, numero_item, entradas, regenerar=()):
+    """Conteúdo gravado do item, se as entradas não mudaram e ele não foi pedido em 'regenerar'."""
+    if numero_item in regenerar:
+        return None
+    conteudo, mudancas = checkpoint.item_reaproveitavel(numero_item, entradas)
+    if mudancas:
+        print(f"  → Item {numero_item}: entradas alteradas ({', '.join(mudancas)}). Gerando novamente...")
+    return conteudo
+
+def preparar_relatorio(prompt_texto, nome_arquivo_pc, regenerar=()):
+    """Lê a estrutura do relatório e o checkpoint do documento PC.
+    
+    Retorna a estrutura {número: título}, os números dos itens, o checkpoint e os
+    itens que devem ser regenerados mesmo sem mudança nas entradas.
+    """
     # 1. Extrair a estrutura do relatório
     estrutura_texto = extrair_estrutura_relatorio(prompt_texto)
     linhas_estrutura = [linha.strip() for linha in estrutura_texto.split('\n') if linha.strip()]
@@ -307,50 +988,340 @@ def gerar_relatorio_completo(prompt_texto, documentos_base, documento_pc, nome_a
         if len(partes) == 2 and partes[0].isdigit():
             estrutura[partes[0]] = partes[1]
     
-    # 2. Extrair as Unidades Curriculares
-    ucs = extrair_unidades_curriculares(documento_pc)
+    numeros = [i for i in range(1, 25) if str(i) in estrutura]
     
-    # 3. Gerar cada item individualmente
-    itens_gerados = {}
+    # Justificativas de itens regenerados também precisam ser regeneradas
+    regenerar = set(regenerar)
+    for i in numeros:
+        if set(dependencias_item(i)[0]) & regenerar:
+            regenerar.add(i)
     
-    # Começar com o título principal
+    # Cada item é reaproveitado ou não conforme as entradas que consumiu (ver entradas_item)
+    checkpoint = CheckpointRelatorio(nome_arquivo_pc)
+    return estrutura, numeros, checkpoint, regenerar
+
+def montar_relatorio(nome_arquivo_pc, itens_gerados):
+    """Monta o relatório na ordem original dos itens e o salva em texto para referência."""
     relatorio_final = f"# Revisão do PCN \"{nome_arquivo_pc}\"\n\n"
     
-    # Gerar itens de 1 a 24
     for i in range(1, 25):
         numero = str(i)
-        if numero in estrutura:
-            titulo = estrutura[numero]
-            
-            # Gerar o item
-            conteudo = gerar_item_relatorio(
-                i, 
-                titulo, 
-                prompt_texto, 
-                documentos_base, 
-                documento_pc, 
-                nome_arquivo_pc,
-                ucs,
-                itens_gerados
-            )
-            
-            # Salvar o conteúdo para referência e para items de justificativa
-            itens_gerados[numero] = conteudo
-            
-            # Adicionar ao relatório final
-            relatorio_final += conteudo + "\n\n"
+        if numero in itens_gerados:
+            relatorio_final += itens_gerados[numero] + "\n\n"
         else:
             print(f"⚠️ Item {i} não encontrado na estrutura")
             relatorio_final += f"## {i}. Item não definido\n\nEste item não foi encontrado na estrutura do relatório.\n\n"
             
-    # 5. Salvar o relatório em texto para referência
     os.makedirs("CACHE", exist_ok=True)
     with open(f"CACHE/relatorio_completo_{nome_arquivo_pc}.md", "w", encoding="utf-8") as f:
         f.write(relatorio_final)
+    return relatorio_final
+
+def gerar_relatorio_completo(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, max_concorrencia=MAX_CONCORRENCIA, regenerar=(), indice_base=None, aquecer_cache=True, agrupar=False, por_uc=False):
+    """Gera o relatório completo com todos os 24 itens garantidos.
+    
+    Cada item é gravado em um checkpoint assim que fica pronto, com as impressões
+    digitais das entradas que consumiu; uma nova execução gera apenas os itens ausentes,
+    com falha ou com entradas alteradas, além dos listados em 'regenerar'.
+    Com aquecer_cache, o primeiro item é gerado sozinho para que os demais encontrem
+    o prefixo comum (prompt e documento PC) já no cache do provedor. Com agrupar, os
+    grupos de GRUPOS_ITENS ainda inteiramente pendentes são gerados em uma chamada cada.
+    Com por_uc, os itens de ITENS_POR_UC são gerados com uma requisição por UC.
+    """
+    print("Iniciando geração do relatório completo por itens...")
+    estrutura, numeros, checkpoint, regenerar = preparar_relatorio(
+        prompt_texto, nome_arquivo_pc, regenerar
+    )
+    itens_gerados = {}
+    reaproveitados = 0
+    # Trechos dos documentos base e entradas de cada item, calculados uma única vez e usados
+    # tanto no manifesto do checkpoint quanto nas mensagens
+    trechos_itens = {}
+    entradas_itens = {}
+    
+    def trechos(i):
+        if indice_base is not None and i not in trechos_itens:
+            trechos_itens[i] = buscar_trechos_base(i, estrutura[str(i)], documento_pc, ucs, indice_base)
+        return trechos_itens.get(i)
+    
+    def entradas(i):
+        if i not in entradas_itens:
+            entradas_itens[i] = entradas_item(
+                i, estrutura[str(i)], prompt_texto, documentos_base, documento_pc,
+                nome_arquivo_pc, ucs, itens_anteriores=itens_gerados, indice_base=indice_base, trechos_base=trechos(i)
+            )
+        return entradas_itens[i]
+    
+    with ThreadPoolExecutor(max_workers=max_concorrencia) as executor:
+        # 2. Extrair as Unidades Curriculares em paralelo com os itens que não dependem delas
+        ucs = checkpoint.ucs(entradas_ucs(documento_pc, nome_arquivo_pc))
+        metadados_ucs = {}
+        futuro_ucs = None
+        if ucs is None:
+            futuro_ucs = executor.submit(extrair_unidades_curriculares, documento_pc, metadados_ucs)
+        
+        # 3. Gerar os itens (ou grupos de itens) assim que suas dependências estiverem prontas
+        itens_pendentes = list(numeros)
+        pendentes = []
+        if agrupar:
+            pendentes = [
+                grupo for grupo in GRUPOS_ITENS
+                if all(i in itens_pendentes for i in grupo) and not (por_uc and set(grupo) & set(ITENS_POR_UC))
+            ]
+        agrupados = {i for grupo in pendentes for i in grupo}
+        pendentes = sorted(pendentes + [(i,) for i in itens_pendentes if i not in agrupados])
+        em_execucao = {}
+        aquecendo = aquecer_cache and len(pendentes) > 1
+        
+        while pendentes or em_execucao:
+            if ucs is None and futuro_ucs.done():
+                ucs = futuro_ucs.result()
+                if metadados_ucs.get("status") == "ok":
+                    checkpoint.salvar_ucs(ucs, entradas_ucs(documento_pc, nome_arquivo_pc))
+            
+            for tarefa in list(pendentes):
+                if aquecendo and em_execucao:
+                    break
+                dependencias = set()
+                precisa_ucs = False
+                for i in tarefa:
+                    dependencias_i, precisa_ucs_i = dependencias_item(i)
+                    dependencias.update(dependencias_i)
+                    precisa_ucs = precisa_ucs or precisa_ucs_i
+                # Dependências fora da estrutura ou dentro do próprio grupo não bloqueiam a tarefa
+                if any(str(d) not in itens_gerados for d in dependencias if d in numeros and d not in tarefa):
+                    continue
+                if precisa_ucs and ucs is None:
+                    continue
+                
+                # Itens cujas entradas não mudaram desde a última execução são reaproveitados
+                pendentes.remove(tarefa)
+                for i in tarefa:
+                    conteudo = reaproveitar_item(checkpoint, i, entradas(i), regenerar)
+                    if conteudo is None:
+                        break
+                    itens_gerados[str(i)] = conteudo
+                    reaproveitados += 1
+                restantes = tuple(i for i in tarefa if str(i) not in itens_gerados)
+                if not restantes:
+                    continue
+                if restantes != tarefa:
+                    # Parte de um grupo foi reaproveitada: o restante é gerado item a item
+                    pendentes = sorted(pendentes + [(i,) for i in restantes])
+                    continue
+                
+                if len(tarefa) == 1:
+                    metadados = {}
+                    futuro = executor.submit(
+                        gerar_item_por_uc if por_uc and tarefa[0] in ITENS_POR_UC else gerar_item_relatorio,
+                        numero_item=tarefa[0],
+                        titulo_item=estrutura[str(tarefa[0])],
+                        prompt_texto=prompt_texto,
+                        documentos_base=documentos_base,
+                        documento_pc=documento_pc,
+                        nome_arquivo_pc=nome_arquivo_pc,
+                        ucs=ucs,
+                        itens_anteriores=dict(itens_gerados),
+                        metadados=metadados,
+                        indice_base=indice_base,
+                        ignorar_cache=tarefa[0] in regenerar,
+                        trechos_base=trechos(tarefa[0])
+                    )
+                else:
+                    metadados = None
+                    futuro = executor.submit(
+                        gerar_grupo_relatorio,
+                        grupo=tarefa,
+                        estrutura=estrutura,
+                        prompt_texto=prompt_texto,
+                        documentos_base=documentos_base,
+                        documento_pc=documento_pc,
+                        nome_arquivo_pc=nome_arquivo_pc,
+                        ucs=ucs,
+                        itens_anteriores=dict(itens_gerados),
+                        indice_base=indice_base,
+                        ignorar_cache=bool(set(tarefa) & regenerar),
+                        trechos_itens={i: trechos(i) for i in tarefa}
+                    )
+                em_execucao[futuro] = (tarefa, metadados)
+            
+            aguardando = set(em_execucao)
+            if ucs is None:
+                aguardando.add(futuro_ucs)
+            concluidos, _ = wait(aguardando, return_when=FIRST_COMPLETED)
+            
+            for futuro in concluidos:
+                if futuro in em_execucao:
+                    tarefa, metadados = em_execucao.pop(futuro)
+                    aquecendo = False
+                    if len(tarefa) == 1:
+                        itens, metadados_itens = {tarefa[0]: futuro.result()}, {tarefa[0]: metadados}
+                    else:
+                        itens, metadados_itens = futuro.result()
+                    # Salvar o conteúdo para referência e para items de justificativa
+                    for numero in tarefa:
+                        # Nos grupos, as entradas dos itens seguintes incluem os itens gerados antes deles
+                        entradas_numero = entradas(numero)
+                        itens_gerados[str(numero)] = itens[numero]
+                        checkpoint.salvar_item(numero, itens[numero], metadados_itens[numero], entradas_numero)
+    
+    if reaproveitados:
+        print(f"  → {reaproveitados} itens reaproveitados do checkpoint (entradas sem alteração)")
+    
+    # 4. Montar o relatório na ordem original dos itens
+    relatorio_final = montar_relatorio(nome_arquivo_pc, itens_gerados)
     
     print(" Relatório completo com 24 itens gerado com sucesso")
     return relatorio_final
 
+def responder_lote(requisicoes, cliente_lote, modelo_lote=MODELO, intervalo_consulta=INTERVALO_CONSULTA, ignorar_cache=()):
+    """Responde {id: messages} com o cache de respostas e, para o restante, com a Batch API.
+    
+    As requisições em ignorar_cache (itens pedidos em --regenerar) vão sempre para a Batch API.
+    """
+    resultados = {}
+    chaves = {}
+    for id_requisicao, mensagens in requisicoes.items():
+        if cache_respostas is None:
+            continue
+        chaves[id_requisicao] = cache_respostas.chave(MODELO, TEMPERATURA, mensagens)
+        if id_requisicao in ignorar_cache and not cache_respostas.somente_replay:
+            continue
+        conteudo = cache_respostas.obter(chaves[id_requisicao])
+        if conteudo is not None:
+            resultados[id_requisicao] = (conteudo, {"status": "ok", "cache": True})
+    
+    pendentes = {id_requisicao: mensagens for id_requisicao, mensagens in requisicoes.items() if id_requisicao not in resultados}
+    print(f"Lote: {len(resultados)} respostas do cache, {len(pendentes)} requisições enviadas à Batch API")
+    if not pendentes:
+        return resultados
+    
+    with telemetria.span("executar_lote", requisicoes=len(pendentes)) as span:
+        respostas = executar_lote(cliente_lote, pendentes, modelo_lote, TEMPERATURA, intervalo_consulta=intervalo_consulta)
+        tokens_prompt = tokens_resposta = custo = 0
+        for id_requisicao, (conteudo, metadados) in respostas.items():
+            if conteudo is None:
+                continue
+            metadados["cache"] = False
+            metadados["custo"] = DESCONTO_LOTE * estimar_custo(
+                MODELO, metadados["tokens_prompt"], metadados["tokens_resposta"], metadados["tokens_cache"]
+            )
+            tokens_prompt += metadados["tokens_prompt"]
+            tokens_resposta += metadados["tokens_resposta"]
+            custo += metadados["custo"]
+            if id_requisicao in chaves:
+                cache_respostas.salvar(chaves[id_requisicao], conteudo)
+        span.update(tokens_prompt=tokens_prompt, tokens_resposta=tokens_resposta, custo=custo,
+                    falhas=sum(1 for conteudo, _ in respostas.values() if conteudo is None))
+    resultados.update(respostas)
+    return resultados
+
+def gerar_relatorios_lote(prompt_texto, documentos_base, documentos_pc, regenerar=(), indice_base=None, cliente_lote=None, modelo_lote=MODELO, intervalo_consulta=INTERVALO_CONSULTA):
+    """Gera os relatórios de vários documentos PC pela Batch API, em ondas.
+    
+    Cada onda reúne, de todos os PCs, as requisições cujas dependências já estão prontas:
+    primeiro as UCs e os itens independentes, depois os itens que usam as UCs e as
+    justificativas, e por fim as justificativas desses itens. Os itens são gravados no
+    checkpoint como no modo síncrono. Retorna {nome do PC: texto do relatório}.
+    """
+    if cliente_lote is None:
+        cliente_lote = obter_cliente()
+    
+    estados = {}
+    for nome_arquivo_pc, documento_pc in documentos_pc.items():
+        print(f"\nPreparando relatório em lote: {nome_arquivo_pc}")
+        estrutura, numeros, checkpoint, regenerar_pc = preparar_relatorio(
+            prompt_texto, nome_arquivo_pc, regenerar
+        )
+        estados[nome_arquivo_pc] = {
+            "documento_pc": documento_pc,
+            "estrutura": estrutura,
+            "numeros": numeros,
+            "checkpoint": checkpoint,
+            "regenerar": regenerar_pc,
+            "itens_gerados": {},
+            "reaproveitados": 0,
+            "pendentes": list(numeros),
+            "ucs": checkpoint.ucs(entradas_ucs(documento_pc, nome_arquivo_pc)),
+            "entradas": {},
+        }
+    
+    onda = 0
+    while True:
+        requisicoes = {}
+        destinos = {}
+        ignorar_cache = set()
+        for nome_arquivo_pc, estado in estados.items():
+            if estado["ucs"] is None:
+                id_requisicao = f"{nome_arquivo_pc}|ucs"
+                requisicoes[id_requisicao] = montar_mensagens_ucs(estado["documento_pc"])
+                destinos[id_requisicao] = (nome_arquivo_pc, None)
+            for i in list(estado["pendentes"]):
+                dependencias, precisa_ucs = dependencias_item(i)
+                if any(str(d) not in estado["itens_gerados"] for d in dependencias if d in estado["numeros"]):
+                    continue
+                if precisa_ucs and estado["ucs"] is None:
+                    continue
+                # Os trechos dos documentos base são buscados uma vez e usados no manifesto e nas mensagens
+                trechos_base = None
+                if indice_base is not None:
+                    trechos_base = buscar_trechos_base(i, estado["estrutura"][str(i)], estado["documento_pc"], estado["ucs"], indice_base)
+                estado["entradas"][i] = entradas_item(
+                    i, estado["estrutura"][str(i)], prompt_texto, documentos_base, estado["documento_pc"],
+                    nome_arquivo_pc, estado["ucs"], itens_anteriores=estado["itens_gerados"], indice_base=indice_base,
+                    trechos_base=trechos_base
+                )
+                conteudo = reaproveitar_item(estado["checkpoint"], i, estado["entradas"][i], estado["regenerar"])
+                if conteudo is not None:
+                    estado["itens_gerados"][str(i)] = conteudo
+                    estado["pendentes"].remove(i)
+                    estado["reaproveitados"] += 1
+                    continue
+                id_requisicao = f"{nome_arquivo_pc}|item{i}"
+                requisicoes[id_requisicao] = montar_mensagens_item(
+                    i, estado["estrutura"][str(i)], prompt_texto, documentos_base, estado["documento_pc"],
+                    nome_arquivo_pc, estado["ucs"], itens_anteriores=dict(estado["itens_gerados"]), indice_base=indice_base,
+                    trechos_base=trechos_base
+                )
+                destinos[id_requisicao] = (nome_arquivo_pc, i)
+                if i in estado["regenerar"]:
+                    ignorar_cache.add(id_requisicao)
+        if not requisicoes:
+            break
+        
+        onda += 1
+        print(f"\nOnda {onda} da Batch API: {len(requisicoes)} requisições")
+        resultados = responder_lote(requisicoes, cliente_lote, modelo_lote, intervalo_consulta, ignorar_cache)
+        
+        for id_requisicao, (nome_arquivo_pc, numero) in destinos.items():
+            estado = estados[nome_arquivo_pc]
+            conteudo, metadados = resultados[id_requisicao]
+            if numero is None:
+                if conteudo is not None:
+                    estado["ucs"] = conteudo
+                    estado["checkpoint"].salvar_ucs(conteudo, entradas_ucs(estado["documento_pc"], nome_arquivo_pc))
+                else:
+                    print(f"Erro ao extrair UCs de {nome_arquivo_pc}: {metadados.get('erro')}")
+                    estado["ucs"] = "Não foi possível extrair as Unidades Curriculares automaticamente."
+                continue
+            titulo_item = estado["estrutura"][str(numero)]
+            if conteudo is not None:
+                conteudo = ajustar_titulo_item(numero, titulo_item, conteudo)
+            else:
+                print(f"Erro ao gerar item {numero} de {nome_arquivo_pc}: {metadados.get('erro')}")
+                conteudo = f"## {numero}. {titulo_item}\n\nNão foi possível gerar este item automaticamente."
+            estado["itens_gerados"][str(numero)] = conteudo
+            estado["pendentes"].remove(numero)
+            estado["checkpoint"].salvar_item(numero, conteudo, metadados, estado["entradas"].pop(numero))
+    
+    for nome_arquivo_pc, estado in estados.items():
+        if estado["reaproveitados"]:
+            print(f"  → {nome_arquivo_pc}: {estado['reaproveitados']} itens reaproveitados do checkpoint (entradas sem alteração)")
+    return {
+        nome_arquivo_pc: montar_relatorio(nome_arquivo_pc, estado["itens_gerados"])
+        for nome_arquivo_pc, estado in estados.items()
+    }
+
 def processar_tabela_markdown(texto_tabela):
     """Processa uma tabela em formato markdown e retorna linhas e colunas."""
     linhas = texto_tabela.strip().split('\n')
@@ -402,6 +1373,11 @@ def processar_tabela_markdown(texto_tabela):
 
 def gerar_relatorio_docx(nome_arquivo, conteudo, output_dir="RELATORIOS"):
     """Gera um relatório formatado em DOCX com tabelas e formatação específica."""
+    from docx import Document
+    from docx.shared import Inches
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from tabela_docx import adicionar_tabela
+    
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
@@ -458,32 +1434,8 @@ def gerar_relatorio_docx(nome_arquivo, conteudo, output_dir="RELATORIOS"):
             colunas, dados = processar_tabela_markdown(tabela_markdown)
             
             if colunas and dados:
-                # Criar tabela no Word
-                table = doc.add_table(rows=1, cols=len(colunas))
-                table.style = 'Table Grid'
-                
-                # Adicionar cabeçalhos
-                head_cells = table.rows[0].cells
-                for idx, col in enumerate(colunas):
-                    head_cells[idx].text = col
-                    # Aplicar negrito ao texto do cabeçalho
-                    for paragraph in head_cells[idx].paragraphs:
-                        for run in paragraph.runs:
-                            run.bold = True
-                        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                
-                # Adicionar linhas de dados
-                for row_data in dados:
-                    cells = table.add_row().cells
-                    for idx, text in enumerate(row_data):
-                        if idx < len(cells):
-                            cells[idx].text = text
-                
-                # Aplicar formatação na tabela - abordagem simplificada que evita o bug
-                table.style = 'Table Grid'  # Esta linha aplica bordas simples
-                
-                # Ajustar largura da tabela para preencher a página
-                table.autofit = True
+                # Criar tabela no Word (XML montado de uma vez, com cabeçalho em negrito e bordas simples)
+                adicionar_tabela(doc, colunas, dados, estilo='Table Grid')
                 
                 # Adicionar espaço após a tabela
                 doc.add_paragraph()
@@ -525,65 +1477,411 @@ def gerar_relatorio_docx(nome_arquivo, conteudo, output_dir="RELATORIOS"):
     print(f"Relatório DOCX gerado: {nome_saida}")
     return nome_saida
 
-def main():
-    """Função principal do programa."""
+def ler_documentos_base(base_dir="BASE", usar_indice=True, reconstruir_cache=False):
+    """Lê os documentos base: o índice de trechos de todos eles ou, sem índice, o primeiro documento.
+    
+    Retorna (documentos_base, indice_base).
+    """
+    documentos_base = {}
+    indice_base = None
+    arquivos_base = sorted(arquivo for arquivo in os.listdir(base_dir) if arquivo.endswith(".pdf"))
+    if usar_indice:
+        # Todos os documentos base são indexados; cada item recebe só os trechos relevantes
+        indice_base = carregar_indice_base(base_dir, arquivos_base, reconstruir=reconstruir_cache)
+    elif arquivos_base:
+        # Sem índice, apenas o primeiro documento base é enviado, limitado a ORCAMENTO_TOKENS_DOCUMENTO_BASE tokens
+        arquivo = arquivos_base[0]
+        caminho = os.path.join(base_dir, arquivo)
+        documentos_base[arquivo] = ler_pdf(caminho, reconstruir=reconstruir_cache, limite_caracteres=LIMITE_BASE)
+        print(f"Documento base lido: {arquivo} ({len(documentos_base[arquivo])} caracteres)")
+    return documentos_base, indice_base
+
+def listar_pcs(pc_dir="PC"):
+    """Arquivos PDF do diretório de documentos PC."""
+    return sorted(arquivo for arquivo in os.listdir(pc_dir) if arquivo.endswith(".pdf"))
+
+def ler_documento_pc(pc_dir, arquivo, reconstruir_cache=False):
+    """Lê o texto de um documento PC (do cache de PDFs, quando possível)."""
+    documento_pc = ler_pdf(
+        os.path.join(pc_dir, arquivo),
+        reconstruir=reconstruir_cache,
+        limite_caracteres=LIMITE_PC
+    )
+    print(f" Documento PC lido: {arquivo} ({len(documento_pc)} caracteres)")
+    return documento_pc
+
+def renderizar_relatorio(nome_arquivo_pc, relatorio_texto, output_dir="RELATORIOS", forcar=False):
+    """Gera o DOCX do relatório; se o texto não mudou desde o último DOCX, ele é reaproveitado (salvo com forcar)."""
+    checkpoint = CheckpointRelatorio(nome_arquivo_pc)
+    impressao_relatorio = impressao_digital(relatorio_texto)
+    caminho = None if forcar else checkpoint.docx(impressao_relatorio)
+    if caminho is not None and os.path.normpath(os.path.dirname(caminho)) == os.path.normpath(output_dir):
+        print(f"\nRelatório sem alterações, reaproveitando o documento Word: {caminho}")
+        return caminho
+    print(f"\nGerando documento Word formatado: {nome_arquivo_pc}")
+    with telemetria.span("gerar_relatorio_docx", pcn=nome_arquivo_pc):
+        caminho = gerar_relatorio_docx(nome_arquivo_pc, relatorio_texto, output_dir)
+    checkpoint.salvar_docx(impressao_relatorio, caminho)
+    return caminho
+
+def extrair_documentos(base_dir="BASE", pc_dir="PC", usar_indice=True, reconstruir_cache=False):
+    """Extrai os PDFs para o cache e constrói o índice dos documentos base, sem chamar a API."""
+    print("\nLendo documentos base...")
+    ler_documentos_base(base_dir, usar_indice, reconstruir_cache)
+    print("\nLendo documentos PC...")
+    for arquivo in listar_pcs(pc_dir):
+        try:
+            ler_documento_pc(pc_dir, arquivo, reconstruir_cache)
+        except Exception as e:
+            print(f"Erro ao extrair {arquivo}: {str(e)}")
+
+def renderizar_relatorios(nomes_pc=(), output_dir="RELATORIOS", forcar=False, cache_dir="CACHE"):
+    """Gera os DOCX a partir dos relatórios em markdown já gerados, sem chamar a API.
+    
+    Sem nomes_pc, todos os relatórios de cache_dir (relatorio_completo_*.md) são renderizados.
+    Retorna {nome do PC: caminho do DOCX}.
+    """
+    prefixo = os.path.join(cache_dir, "relatorio_completo_")
+    relatorios = {caminho[len(prefixo):-3]: caminho for caminho in sorted(glob.glob(f"{prefixo}*.md"))}
+    if nomes_pc:
+        nomes_pc = [nome[:-4] if nome.endswith(".pdf") else nome for nome in nomes_pc]
+        for nome in nomes_pc:
+            if nome not in relatorios:
+                print(f"⚠️ Relatório de {nome} não encontrado em {cache_dir}. Gere-o antes com o comando generate.")
+        relatorios = {nome: caminho for nome, caminho in relatorios.items() if nome in nomes_pc}
+    
+    resultados = {}
+    for nome_arquivo_pc, caminho in relatorios.items():
+        with open(caminho, "r", encoding="utf-8") as f:
+            relatorio_texto = f.read()
+        try:
+            resultados[nome_arquivo_pc] = renderizar_relatorio(nome_arquivo_pc, relatorio_texto, output_dir, forcar)
+        except Exception as e:
+            print(f"Erro ao gerar o documento Word de {nome_arquivo_pc}: {str(e)}")
+    return resultados
+
+def planejar_tokens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, regenerar=(), indice_base=None, agrupar=False, por_uc=False):
+    """Imprime as requisições e os tokens que a geração do relatório faria, sem chamar a API.
+    
+    Os itens reaproveitáveis pelo checkpoint ficam fora do plano. Itens que dependem de
+    outros ainda não gerados são medidos sem o conteúdo deles e, enquanto as UCs não forem
+    extraídas, cada item por UC conta como uma requisição. Retorna os totais
+    (requisicoes, tokens_entrada, tokens_cache, tokens_resposta, custo).
+    """
+    estrutura, numeros, checkpoint, regenerar = preparar_relatorio(
+        prompt_texto, nome_arquivo_pc, regenerar
+    )
+    ucs = checkpoint.ucs(entradas_ucs(documento_pc, nome_arquivo_pc))
+    tarefas = []
+    if ucs is None:
+        tarefas.append(("UCs", [montar_mensagens_ucs(documento_pc)], TOKENS_RESPOSTA_ESTIMADOS))
+        ucs = "(Unidades Curriculares a extrair)"
+    
+    itens = {}
+    a_gerar = []
+    trechos_itens = {}
+    for i in numeros:
+        if indice_base is not None:
+            trechos_itens[i] = buscar_trechos_base(i, estrutura[str(i)], documento_pc, ucs, indice_base)
+        conteudo = reaproveitar_item(checkpoint, i, entradas_item(
+            i, estrutura[str(i)], prompt_texto, documentos_base, documento_pc,
+            nome_arquivo_pc, ucs, itens_anteriores=itens, indice_base=indice_base, trechos_base=trechos_itens.get(i)
+        ), regenerar)
+        if conteudo is None:
+            a_gerar.append(i)
+        else:
+            itens[str(i)] = conteudo
+    
+    grupos = []
+    if agrupar:
+        grupos = [
+            grupo for grupo in GRUPOS_ITENS
+            if all(i in a_gerar for i in grupo) and not (por_uc and set(grupo) & set(ITENS_POR_UC))
+        ]
+    agrupados = {i for grupo in grupos for i in grupo}
+    ucs_lista = listar_ucs(ucs)
+    for tarefa in sorted(grupos + [(i,) for i in a_gerar if i not in agrupados]):
+        if len(tarefa) > 1:
+            mensagens = [montar_mensagens_grupo(
+                tarefa, estrutura, prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, ucs,
+                itens_anteriores=itens, indice_base=indice_base, trechos_itens=trechos_itens
+            )]
+            tarefas.append((f"{tarefa[0]}-{tarefa[-1]}", mensagens, TOKENS_RESPOSTA_ESTIMADOS * len(tarefa)))
+        elif por_uc and tarefa[0] in ITENS_POR_UC and len(ucs_lista) >= 2:
+            mensagens = [montar_mensagens_item_uc(
+                tarefa[0], estrutura[str(tarefa[0])], prompt_texto, documentos_base, documento_pc,
+                nome_arquivo_pc, uc, itens_anteriores=itens, indice_base=indice_base, trechos_base=trechos_itens.get(tarefa[0])
+            ) for uc in ucs_lista]
+            tarefas.append((str(tarefa[0]), mensagens, TOKENS_RESPOSTA_ESTIMADOS))
+        else:
+            mensagens = [montar_mensagens_item(
+                tarefa[0], estrutura[str(tarefa[0])], prompt_texto, documentos_base, documento_pc,
+                nome_arquivo_pc, ucs, itens_anteriores=itens, indice_base=indice_base, trechos_base=trechos_itens.get(tarefa[0])
+            )]
+            tarefas.append((str(tarefa[0]), mensagens, TOKENS_RESPOSTA_ESTIMADOS))
+    
+    # Depois da primeira requisição de item, o prefixo comum tende a vir do cache do provedor
+    tokens_prefixo = contar_tokens_mensagens(montar_prefixo_mensagens(prompt_texto, documentos_base, documento_pc, nome_arquivo_pc, indice_base))
+    if tokens_prefixo < TOKENS_MINIMOS_CACHE_PREFIXO:
+        tokens_prefixo = 0
+    disponivel = tokens_entrada_disponiveis(MODELO)
+    totais = {"requisicoes": 0, "tokens_entrada": 0, "tokens_cache": 0, "tokens_resposta": 0}
+    
+    print(f"\nPlano de tokens: {nome_arquivo_pc} ({len(numeros) - len(a_gerar)} itens reaproveitados do checkpoint)")
+    print(f"{'Tarefa':<10}{'Requisições':>13}{'Entrada':>10}{'Maior':>9}{'Saída':>8}")
+    requisicoes_item = 0
+    for rotulo, mensagens, tokens_resposta in tarefas:
+        tokens = [contar_tokens_mensagens(messages) for messages in mensagens]
+        if rotulo != "UCs":
+            totais["tokens_cache"] += tokens_prefixo * (len(tokens) - (requisicoes_item == 0))
+            requisicoes_item += len(tokens)
+        totais["requisicoes"] += len(tokens)
+        totais["tokens_entrada"] += sum(tokens)
+        totais["tokens_resposta"] += tokens_resposta
+        aviso = "  ⚠️ excede o contexto" if max(tokens) > disponivel else ""
+        print(f"{rotulo:<10}{len(tokens):>13}{sum(tokens):>10}{max(tokens):>9}{tokens_resposta:>8}{aviso}")
+    totais["custo"] = estimar_custo(MODELO, totais["tokens_entrada"], totais["tokens_resposta"], totais["tokens_cache"])
+    print(
+        f"Total: {totais['requisicoes']} requisições, {totais['tokens_entrada']} tokens de entrada "
+        f"({totais['tokens_cache']} do cache de prefixo), {totais['tokens_resposta']} de saída estimados, "
+        f"US$ {totais['custo']:.2f}"
+    )
+    return totais
+
+def planejar_execucao(base_dir="BASE", pc_dir="PC", prompt_file="prompt.txt", usar_indice=True, reconstruir_cache=False, regenerar=(), agrupar_itens=False, por_uc=False):
+    """Plano de tokens (--dry-run) de todos os PCs: só lê os PDFs e o prompt, sem criar o cliente da API."""
+    prompt_texto = ler_prompt(prompt_file)
+    print("\nLendo documentos base...")
+    documentos_base, indice_base = ler_documentos_base(base_dir, usar_indice, reconstruir_cache)
+    totais = Counter()
+    arquivos_pc = listar_pcs(pc_dir)
+    for arquivo in arquivos_pc:
+        documento_pc = ler_documento_pc(pc_dir, arquivo, reconstruir_cache)
+        totais.update(planejar_tokens(
+            prompt_texto, documentos_base, documento_pc, arquivo.replace(".pdf", ""),
+            regenerar, indice_base, agrupar_itens, por_uc
+        ))
+    print(
+        f"\nTotal de {len(arquivos_pc)} PCs: {totais['requisicoes']} requisições, {totais['tokens_entrada']} tokens de entrada "
+        f"({totais['tokens_cache']} do cache de prefixo), {totais['tokens_resposta']} de saída estimados, US$ {totais['custo']:.2f}"
+    )
+
+def main(reconstruir_cache=False, namespace_cache="padrao", somente_replay=False, usar_cache_respostas=True, regenerar=(), usar_indice=True, telemetria_dir="TELEMETRIA", modo_lote=False, lote_local=False, modelo_lote=MODELO, streaming=True, agrupar_itens=False, por_uc=False, base_dir="BASE", pc_dir="PC", prompt_file="prompt.txt", output_dir="RELATORIOS", renderizar_docx=True, estrutura_llm=False, max_concorrencia=MAX_CONCORRENCIA):
+    """Função principal do programa.
+    
+    Sem renderizar_docx, os relatórios ficam apenas em markdown (CACHE/relatorio_completo_*.md).
+    max_concorrencia limita as chamadas simultâneas à API na geração de cada relatório.
+    Com estrutura_llm, o modelo é consultado se a estrutura não puder ser lida do prompt.
+    O modo lote não suporta agrupar_itens nem por_uc.
+    """
+    if modo_lote and (agrupar_itens or por_uc):
+        raise ValueError("O modo lote (Batch API) não suporta agrupar_itens nem por_uc")
+    
     print("\n" + "="*50)
     print("INICIANDO PROCESSAMENTO")
     print("="*50)
     
-    # Configurar diretórios
-    base_dir = "BASE"
-    pc_dir = "PC"
-    prompt_file = "prompt.txt"
+    configurar_cache_respostas(namespace_cache, somente_replay, usar_cache_respostas)
+    global usar_streaming
+    usar_streaming = streaming
+    
+    # Cada execução grava seus spans (tempo, tokens e custo por etapa) em um arquivo JSONL próprio
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    telemetria.configurar(os.path.join(telemetria_dir, f"execucao_{timestamp}.jsonl"))
     
     # 1. Ler prompt uma única vez
     print("\nLendo o prompt...")
     prompt_texto = ler_prompt(prompt_file)
     print(f"Prompt lido: {len(prompt_texto)} caracteres")
+    # A estrutura fica memorizada para todos os PCs
+    extrair_estrutura_relatorio(prompt_texto, usar_llm=estrutura_llm)
     
     # 2. Ler documentos base uma única vez
     print("\nLendo documentos base...")
-    documentos_base = {}
-    for arquivo in os.listdir(base_dir):
-        if arquivo.endswith(".pdf"):
-            caminho = os.path.join(base_dir, arquivo)
-            documentos_base[arquivo] = ler_pdf(caminho)
-            print(f"Documento base lido: {arquivo} ({len(documentos_base[arquivo])} caracteres)")
+    documentos_base, indice_base = ler_documentos_base(base_dir, usar_indice, reconstruir_cache)
     
-    # 3. Processar cada documento PC
+    # 3. Processar os documentos PC em pipeline: extração, geração e renderização sobrepostas
     print("\nProcessando documentos PC...")
-    for arquivo in os.listdir(pc_dir):
-        if arquivo.endswith(".pdf"):
+    arquivos_pc = listar_pcs(pc_dir)
+    
+    def extrair(arquivo):
+        return ler_documento_pc(pc_dir, arquivo, reconstruir_cache)
+    
+    def gerar(arquivo, documento_pc):
+        print(f"\nGerando relatório completo com 24 itens: {arquivo}")
+        with telemetria.span("gerar_relatorio_completo", pcn=arquivo.replace(".pdf", "")):
+            return gerar_relatorio_completo(
+                prompt_texto, 
+                documentos_base, 
+                documento_pc,
+                arquivo.replace(".pdf", ""),
+                max_concorrencia=max_concorrencia,
+                regenerar=regenerar,
+                indice_base=indice_base,
+                agrupar=agrupar_itens,
+                por_uc=por_uc
+            )
+    
+    def renderizar(arquivo, relatorio_texto):
+        if not renderizar_docx:
+            return os.path.join("CACHE", f"relatorio_completo_{arquivo.replace('.pdf', '')}.md")
+        return renderizar_relatorio(arquivo.replace(".pdf", ""), relatorio_texto, output_dir)
+    
+    if modo_lote:
+        # Todas as requisições de todos os PCs vão para a Batch API; a renderização não muda
+        documentos_pc = {arquivo.replace(".pdf", ""): extrair(arquivo) for arquivo in arquivos_pc}
+        cliente = obter_cliente()
+        relatorios = gerar_relatorios_lote(
+            prompt_texto,
+            documentos_base,
+            documentos_pc,
+            regenerar=regenerar,
+            indice_base=indice_base,
+            cliente_lote=ClienteLoteLocal(cliente) if lote_local else cliente,
+            modelo_lote=modelo_lote
+        )
+        for arquivo in arquivos_pc:
             try:
-                print(f"\nProcessando: {arquivo}")
-                caminho = os.path.join(pc_dir, arquivo)
-                
-                # Ler o documento PC uma única vez
-                documento_pc = ler_pdf(caminho)
-                print(f" Documento PC lido: {len(documento_pc)} caracteres")
-                
-                # Gerar o relatório completo com todos os 23 itens garantidos
-                print("\nGerando relatório completo com 23 itens...")
-                relatorio_texto = gerar_relatorio_completo(
-                    prompt_texto, 
-                    documentos_base, 
-                    documento_pc,
-                    arquivo.replace(".pdf", "")
-                )
-                
-                # Gerar documento Word formatado
-                print("\nGerando documento Word formatado...")
-                nome_saida = gerar_relatorio_docx(arquivo.replace(".pdf", ""), relatorio_texto)
-                
-                print(f"\n Processamento completo: {arquivo} → {nome_saida}")
+                renderizar(arquivo, relatorios[arquivo.replace(".pdf", "")])
             except Exception as e:
-                print(f"\n❌ ERRO ao processar {arquivo}: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                print(f"Erro ao gerar o documento Word de {arquivo}: {str(e)}")
+    else:
+        processar_lote(arquivos_pc, extrair, gerar, renderizar)
+    
+    telemetria.imprimir_resumo()
+    telemetria.fechar()
     
     print("\n" + "="*50)
     print("PROCESSAMENTO CONCLUÍDO")
     print("="*50)
 
+def criar_parser():
+    """Linha de comando com os subcomandos de cada etapa (extract, generate, render), run e os do serviço residente."""
+    parser = argparse.ArgumentParser(description="Revisão de Planos de Curso Nacionais com IA")
+    subcomandos = parser.add_subparsers(dest="comando", required=True, metavar="{" + ",".join(COMANDOS) + "}")
+    
+    documentos = argparse.ArgumentParser(add_help=False)
+    documentos.add_argument("--base-dir", default="BASE", help="diretório dos documentos base (PDF)")
+    documentos.add_argument("--pc-dir", default="PC", help="diretório dos documentos PC (PDF)")
+    documentos.add_argument("--rebuild-cache", action="store_true", help="extrai novamente os PDFs, ignorando o cache")
+    documentos.add_argument("--sem-indice", action="store_true", help="envia o início do primeiro documento base em vez dos trechos recuperados pelo índice")
+    
+    geracao = argparse.ArgumentParser(add_help=False)
+    geracao.add_argument("--prompt", default="prompt.txt", help="arquivo do prompt")
+    geracao.add_argument("--cache-namespace", default="padrao", help="namespace do cache de respostas da API")
+    geracao.add_argument("--replay", action="store_true", help="usa apenas respostas em cache e falha em vez de chamar a API")
+    geracao.add_argument("--sem-cache-respostas", action="store_true", help="desativa o cache de respostas da API")
+    geracao.add_argument("--telemetria-dir", default="TELEMETRIA", help="diretório dos arquivos JSONL de telemetria")
+    geracao.add_argument("--agrupar", action="store_true", help="gera itens relacionados (7-10 e cada escolha com sua justificativa) em uma chamada com saída JSON")
+    geracao.add_argument("--por-uc", action="store_true", help="gera as tabelas por UC (itens 2, 3 e 6 a 10) com uma requisição por UC, em paralelo")
+    geracao.add_argument("--estrutura-llm", action="store_true", help="consulta o modelo se a estrutura dos 24 itens não puder ser lida do prompt (em vez de usar a estrutura padrão)")
+    geracao.add_argument("--sem-streaming", action="store_true", help="recebe cada item de uma vez, sem streaming (versões antigas da API)")
+    
+    execucao = argparse.ArgumentParser(add_help=False)
+    execucao.add_argument("--dry-run", action="store_true", help="mostra as requisições e os tokens previstos para cada PC, sem chamar a API")
+    execucao.add_argument("--concorrencia", type=int, default=MAX_CONCORRENCIA, help="chamadas simultâneas à API na geração de cada relatório")
+    execucao.add_argument("--regenerar", default="", help="números dos itens a gerar novamente, separados por vírgula (ex.: 12,14)")
+    execucao.add_argument("--batch", action="store_true", help="envia as requisições de todos os PCs pela Batch API, em ondas (mais barato, não interativo; sem --agrupar e --por-uc)")
+    execucao.add_argument("--batch-local", action="store_true", help="com --batch, executa os lotes localmente com chamadas síncronas (testes)")
+    execucao.add_argument("--implantacao-lote", default=MODELO, help="implantação do tipo Global Batch usada com --batch")
+    
+    fila = argparse.ArgumentParser(add_help=False)
+    fila.add_argument("--fila", default="CACHE/trabalhos.sqlite3", help="banco SQLite da fila de trabalhos do serviço")
+    
+    saida = argparse.ArgumentParser(add_help=False)
+    saida.add_argument("--saida-dir", default="RELATORIOS", help="diretório dos relatórios DOCX")
+    
+    subcomandos.add_parser("extract", parents=[documentos], help="extrai os PDFs para o cache e indexa os documentos base (sem chamar a API)")
+    subcomandos.add_parser("generate", parents=[documentos, geracao, execucao], help="gera os relatórios em markdown (CACHE/relatorio_completo_*.md), sem o DOCX")
+    render = subcomandos.add_parser("render", parents=[saida], help="gera os DOCX a partir dos relatórios em markdown já gerados (sem chamar a API)")
+    render.add_argument("pcs", nargs="*", help="nomes dos PCs (padrão: todos os relatórios em CACHE)")
+    render.add_argument("--forcar", action="store_true", help="gera o DOCX mesmo que o relatório não tenha mudado")
+    subcomandos.add_parser("run", parents=[documentos, geracao, execucao, saida], help="executa o pipeline completo (padrão quando nenhum subcomando é informado)")
+    serve = subcomandos.add_parser("serve", parents=[geracao, saida, fila], help="serviço residente que revisa os PCNs enviados à fila, com prompt, documentos base e cliente já carregados")
+    serve.add_argument("--base-dir", default="BASE", help="diretório dos documentos base (PDF)")
+    serve.add_argument("--sem-indice", action="store_true", help="envia o início do primeiro documento base em vez dos trechos recuperados pelo índice")
+    serve.add_argument("--concorrencia", type=int, default=2, help="PCNs revisados ao mesmo tempo")
+    serve.add_argument("--porta", type=int, default=None, help="expõe a fila em HTTP (GET/POST /trabalhos) nesta porta local")
+    submit = subcomandos.add_parser("submit", parents=[fila], help="envia PDFs de PCN para a fila do serviço")
+    submit.add_argument("arquivos", nargs="+", help="PDFs dos PCNs")
+    submit.add_argument("--regenerar", default="", help="números dos itens a gerar novamente, separados por vírgula (ex.: 12,14)")
+    status = subcomandos.add_parser("status", parents=[fila], help="situação e tempos por etapa dos trabalhos da fila")
+    status.add_argument("ids", nargs="*", type=int, help="ids dos trabalhos (padrão: os mais recentes)")
+    status.add_argument("--limite", type=int, default=20, help="quantidade de trabalhos listados sem ids")
+    return parser
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    argumentos = sys.argv[1:]
+    if not argumentos or argumentos[0] not in COMANDOS + ("-h", "--help"):
+        # Sem subcomando, executa o pipeline completo, como nas versões anteriores
+        argumentos = ["run"] + argumentos
+    parser = criar_parser()
+    args = parser.parse_args(argumentos)
+    if getattr(args, "batch", False) and (args.agrupar or args.por_uc):
+        # A Batch API gera cada item em uma requisição própria (sem grupos nem requisições por UC)
+        parser.error("--batch não pode ser combinado com --agrupar ou --por-uc")
+    if getattr(args, "concorrencia", 1) < 1:
+        parser.error("--concorrencia deve ser pelo menos 1")
+    if args.comando == "extract":
+        extrair_documentos(args.base_dir, args.pc_dir, not args.sem_indice, args.rebuild_cache)
+    elif args.comando == "render":
+        renderizar_relatorios(args.pcs, args.saida_dir, args.forcar)
+    elif args.comando in ("serve", "submit", "status"):
+        import servico
+        if args.comando == "serve":
+            servico.servir(
+                sys.modules[__name__],
+                fila_caminho=args.fila,
+                base_dir=args.base_dir,
+                prompt_file=args.prompt,
+                output_dir=args.saida_dir,
+                usar_indice=not args.sem_indice,
+                namespace_cache=args.cache_namespace,
+                somente_replay=args.replay,
+                usar_cache_respostas=not args.sem_cache_respostas,
+                telemetria_dir=args.telemetria_dir,
+                streaming=not args.sem_streaming,
+                agrupar_itens=args.agrupar,
+                por_uc=args.por_uc,
+                concorrencia=args.concorrencia,
+                porta=args.porta,
+                estrutura_llm=args.estrutura_llm
+            )
+        elif args.comando == "submit":
+            servico.enfileirar(args.arquivos, args.fila, [int(numero) for numero in args.regenerar.split(",") if numero.strip()])
+        else:
+            servico.imprimir_status(args.ids, args.fila, args.limite)
+    elif args.dry_run:
+        planejar_execucao(
+            base_dir=args.base_dir,
+            pc_dir=args.pc_dir,
+            prompt_file=args.prompt,
+            usar_indice=not args.sem_indice,
+            reconstruir_cache=args.rebuild_cache,
+            regenerar=[int(numero) for numero in args.regenerar.split(",") if numero.strip()],
+            agrupar_itens=args.agrupar,
+            por_uc=args.por_uc
+        )
+    else:
+        main(
+            reconstruir_cache=args.rebuild_cache,
+            namespace_cache=args.cache_namespace,
+            somente_replay=args.replay,
+            usar_cache_respostas=not args.sem_cache_respostas,
+            regenerar=[int(numero) for numero in args.regenerar.split(",") if numero.strip()],
+            usar_indice=not args.sem_indice,
+            telemetria_dir=args.telemetria_dir,
+            modo_lote=args.batch,
+            lote_local=args.batch_local,
+            modelo_lote=args.implantacao_lote,
+            streaming=not args.sem_streaming,
+            agrupar_itens=args.agrupar,
+            por_uc=args.por_uc,
+            base_dir=args.base_dir,
+            pc_dir=args.pc_dir,
+            prompt_file=args.prompt,
+            output_dir=getattr(args, "saida_dir", "RELATORIOS"),
+            renderizar_docx=args.comando == "run",
+            estrutura_llm=args.estrutura_llm,
+            max_concorrencia=args.concorrencia
+        )
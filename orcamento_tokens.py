@@ -0,0 +1,184 @@
+import bisect
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+
+# Janela de contexto e máximo de tokens de saída de cada modelo
+LIMITES_MODELOS = {
+    "gpt-4o": {"contexto": 128000, "saida": 16384},
+}
+LIMITES_PADRAO = {"contexto": 128000, "saida": 4096}
+
+# Estimativa conservadora para texto em português quando o tiktoken não está disponível
+CARACTERES_POR_TOKEN = 3.2
+
+# Um corte em fronteira de UC ou de página só é usado se mantiver ao menos esta fração do orçamento
+FRACAO_MINIMA_CORTE = 0.7
+
+# Linhas que iniciam uma seção de Unidade Curricular
+PADRAO_SECAO = re.compile(r"^[ \t]*(?:UC\s*\d+|Unidade Curricular\s+\d+)\b.*$", re.IGNORECASE | re.MULTILINE)
+
+# Quantidade de documentos com índice de offsets mantidos em memória
+MAX_INDICES_EM_MEMORIA = 64
+
+# Títulos de seções omitidas listados no aviso de recorte
+MAX_SECOES_NO_LOG = 10
+
+_codificador = None
+_codificador_carregado = False
+_indices = OrderedDict()
+_recortes_registrados = set()
+_lock = threading.Lock()
+
+
+class ContextoExcedidoError(ValueError):
+    """As mensagens não cabem na janela de contexto do modelo."""
+
+
+def _obter_codificador():
+    """Codificador do tiktoken para o gpt-4o, ou None se não estiver disponível."""
+    global _codificador, _codificador_carregado
+    if not _codificador_carregado:
+        with _lock:
+            if not _codificador_carregado:
+                try:
+                    import tiktoken
+                    _codificador = tiktoken.get_encoding("o200k_base")
+                except ImportError:
+                    # tiktoken é opcional; sem ele, os tokens são estimados pelo tamanho do texto
+                    pass
+                except Exception as e:
+                    # Sem acesso ao arquivo de vocabulário (ex.: máquina sem rede)
+                    print(f"⚠️ tiktoken indisponível ({str(e)}). Estimando tokens pelo tamanho do texto...")
+                _codificador_carregado = True
+    return _codificador
+
+
+def contar_tokens(texto):
+    """Quantidade de tokens do texto (exata com tiktoken, estimada sem ele)."""
+    codificador = _obter_codificador()
+    if codificador is None:
+        return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+    return len(codificador.encode(texto, disallowed_special=()))
+
+
+def tokens_entrada_disponiveis(modelo):
+    """Tokens de entrada que cabem na janela de contexto, reservando a saída máxima do modelo."""
+    limites = LIMITES_MODELOS.get(modelo, LIMITES_PADRAO)
+    return limites["contexto"] - limites["saida"]
+
+
+def contar_tokens_mensagens(messages):
+    """Tokens de entrada de uma requisição de chat."""
+    # Cada mensagem tem alguns tokens de formatação além do conteúdo
+    return sum(contar_tokens(mensagem["content"]) + 4 for mensagem in messages)
+
+
+def verificar_contexto(messages, modelo):
+    """Conta os tokens das mensagens e gera ContextoExcedidoError se elas não couberem no modelo."""
+    total = contar_tokens_mensagens(messages)
+    disponivel = tokens_entrada_disponiveis(modelo)
+    if total > disponivel:
+        raise ContextoExcedidoError(f"{total} tokens de entrada excedem os {disponivel} disponíveis para {modelo}")
+    return total
+
+
+class IndiceOffsets:
+    """Offsets das linhas de um documento com a contagem acumulada de tokens até cada uma.
+
+    Cada início de linha é uma fronteira de corte, classificada como 'secao' (título de UC),
+    'pagina' (após uma linha vazia) ou 'linha'.
+    """
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.offsets = [0]
+        self.tokens = [0]
+        self.tipos = ["secao"]
+        acumulado = 0
+        posicao = 0
+        linhas = texto.splitlines(keepends=True)
+        for i, linha in enumerate(linhas):
+            acumulado += contar_tokens(linha)
+            posicao += len(linha)
+            self.offsets.append(posicao)
+            self.tokens.append(acumulado)
+            proxima = linhas[i + 1] if i + 1 < len(linhas) else ""
+            if PADRAO_SECAO.match(proxima):
+                self.tipos.append("secao")
+            elif not linha.strip():
+                self.tipos.append("pagina")
+            else:
+                self.tipos.append("linha")
+        self.total = acumulado
+        self.recortes = {}
+
+    def recortar(self, max_tokens):
+        """Retorna o maior início do texto que cabe em max_tokens e a descrição do que foi descartado."""
+        if max_tokens not in self.recortes:
+            self.recortes[max_tokens] = self._recortar(max_tokens)
+        return self.recortes[max_tokens]
+
+    def _recortar(self, max_tokens):
+        if self.total <= max_tokens:
+            return self.texto, {"tokens": 0, "secoes": []}
+        limite = bisect.bisect_right(self.tokens, max_tokens) - 1
+        corte = limite
+        # Preferir terminar antes de uma UC e, em seguida, no fim de uma página
+        for tipo in ("secao", "pagina"):
+            candidatos = [k for k in range(limite, 0, -1) if self.tipos[k] == tipo and self.tokens[k] >= FRACAO_MINIMA_CORTE * max_tokens]
+            if candidatos:
+                corte = candidatos[0]
+                break
+        if corte == 0:
+            # Nem a primeira linha cabe no orçamento: corte aproximado por caracteres
+            posicao = int(max_tokens * CARACTERES_POR_TOKEN)
+            while posicao > 0 and contar_tokens(self.texto[:posicao]) > max_tokens:
+                posicao = int(posicao * 0.9)
+            return self.texto[:posicao], {
+                "tokens": self.total - contar_tokens(self.texto[:posicao]),
+                "secoes": [secao.strip() for secao in PADRAO_SECAO.findall(self.texto[posicao:])],
+            }
+        restante = self.texto[self.offsets[corte]:]
+        return self.texto[:self.offsets[corte]], {
+            "tokens": self.total - self.tokens[corte],
+            "secoes": [secao.strip() for secao in PADRAO_SECAO.findall(restante)],
+        }
+
+
+def obter_indice(texto):
+    """Índice de offsets do documento, calculado uma vez por conteúdo."""
+    chave = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+    with _lock:
+        if chave in _indices:
+            _indices.move_to_end(chave)
+            return _indices[chave]
+    indice = IndiceOffsets(texto)
+    with _lock:
+        _indices[chave] = indice
+        while len(_indices) > MAX_INDICES_EM_MEMORIA:
+            _indices.popitem(last=False)
+    return indice
+
+
+def recortar_documento(texto, max_tokens, descricao="documento"):
+    """Recorta o texto para caber em max_tokens, preferindo terminar antes de uma UC ou no fim de uma página.
+
+    O que foi descartado (tokens e títulos das UCs omitidas) é informado uma única vez por documento.
+    """
+    indice = obter_indice(texto)
+    recortado, descartado = indice.recortar(max_tokens)
+    if descartado["tokens"]:
+        registro = (descricao, hashlib.sha256(texto.encode("utf-8")).hexdigest(), max_tokens)
+        with _lock:
+            novo = registro not in _recortes_registrados
+            _recortes_registrados.add(registro)
+        if novo:
+            print(f"⚠️ {descricao}: {descartado['tokens']} de {indice.total} tokens descartados para caber em {max_tokens} tokens")
+            secoes = descartado["secoes"]
+            if secoes:
+                extras = f" (e mais {len(secoes) - MAX_SECOES_NO_LOG})" if len(secoes) > MAX_SECOES_NO_LOG else ""
+                print(f"  → Seções omitidas: {'; '.join(secoes[:MAX_SECOES_NO_LOG])}{extras}")
+    return recortado
@@ -0,0 +1,108 @@
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Orçamentos de novas tentativas, separados por tipo de erro
+MAX_TENTATIVAS_LIMITE = 8
+MAX_TENTATIVAS_TRANSITORIAS = 3
+
+# Backoff exponencial (em segundos) entre tentativas
+ESPERA_BASE = 2.0
+ESPERA_MAXIMA = 60.0
+
+# Erros 429 seguidos que abrem o disjuntor e tempo mínimo em que ele fica aberto
+LIMIAR_DISJUNTOR = 3
+PAUSA_DISJUNTOR = 30.0
+
+# Códigos HTTP que indicam falha passageira do serviço
+STATUS_TRANSITORIOS = {408, 409, 500, 502, 503, 504}
+
+
+def classificar_erro(erro):
+    """Classifica um erro da API em 'limite' (429), 'transitorio' ou 'permanente'.
+
+    Só erros da API (openai.APIError) e falhas de rede ou de tempo limite são repetidos;
+    qualquer outra exceção (ex.: um erro no código que lê o stream) é 'permanente'.
+    """
+    # O openai e o httpx só são carregados com o cliente; se não estiverem carregados,
+    # o erro não pode ter vindo deles (importá-los aqui atrasaria o início do programa)
+    openai = sys.modules.get("openai")
+    httpx = sys.modules.get("httpx")
+    if openai is not None and isinstance(erro, openai.APIError):
+        if isinstance(erro, openai.RateLimitError):
+            return "limite"
+        if isinstance(erro, openai.APIStatusError):
+            # 400 (ex.: contexto longo demais), 401, 403, 404 e 422 falham igual em qualquer tentativa
+            return "transitorio" if erro.status_code in STATUS_TRANSITORIOS or erro.status_code >= 500 else "permanente"
+        # Conexão, tempo limite e erros enviados no meio do stream
+        return "transitorio"
+    # Falhas de rede durante a leitura do stream chegam sem o invólucro do openai
+    if httpx is not None and isinstance(erro, httpx.TransportError):
+        return "transitorio"
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return "transitorio"
+    return "permanente"
+
+
+def tempo_retry_after(erro):
+    """Segundos indicados pelo servidor nos cabeçalhos Retry-After, ou None."""
+    cabecalhos = getattr(getattr(erro, "response", None), "headers", None)
+    if not cabecalhos:
+        return None
+    valor = cabecalhos.get("retry-after-ms")
+    if valor:
+        try:
+            return float(valor) / 1000
+        except ValueError:
+            pass
+    valor = cabecalhos.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def calcular_espera(tentativa, retry_after=None):
+    """Espera antes da próxima tentativa: backoff exponencial com jitter, respeitando o Retry-After."""
+    espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa))
+    if retry_after is not None:
+        # O jitter evita que todos os workers voltem no mesmo instante
+        espera = min(retry_after, ESPERA_MAXIMA) + random.uniform(0, 1)
+    return espera
+
+
+class Disjuntor:
+    """Pausa todas as chamadas quando a implantação responde 429 repetidamente."""
+
+    def __init__(self, limitador, limiar=LIMIAR_DISJUNTOR, pausa=PAUSA_DISJUNTOR):
+        self.limitador = limitador
+        self.limiar = limiar
+        self.pausa = pausa
+        self.limites_seguidos = 0
+        self.lock = threading.Lock()
+
+    def registrar_sucesso(self):
+        """Fecha o disjuntor e recupera o ritmo do limitador."""
+        with self.lock:
+            self.limites_seguidos = 0
+        self.limitador.recuperar()
+
+    def registrar_limite(self, retry_after=None):
+        """Registra um 429; ao atingir o limiar, suspende todas as chamadas do processo."""
+        self.limitador.reduzir()
+        with self.lock:
+            self.limites_seguidos += 1
+            if self.limites_seguidos < self.limiar:
+                return
+            self.limites_seguidos = 0
+        pausa = max(self.pausa, retry_after or 0)
+        print(f"⚠️ Implantação saturada ({self.limiar} respostas 429 seguidas). Pausando as chamadas por {pausa:.0f}s...")
+        self.limitador.pausar(pausa)
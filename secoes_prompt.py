@@ -0,0 +1,167 @@
+import hashlib
+import re
+import unicodedata
+
+# Marcadores que dividem o bloco <FINE-TUNING> em orientações temáticas, na ordem em que aparecem
+MARCADORES_ORIENTACOES = [
+    ("impacto", "<FINE-TUNING>"),
+    ("carga_horaria", "/// Proposta de Reestruturação da Carga Horária"),
+    ("novo_nome", "/// Para todas as Unidades Curriculares (UC) que sofrerem"),
+    ("nova_carga_horaria", "# 2. Nova carga horária"),
+    ("indicadores", "# 3. Indicadores"),
+    ("elementos", "- 4. Elementos de Competência"),
+    ("conhecimentos", "- 4.1 Conhecimentos"),
+    ("habilidades", "- 4.2 Habilidades"),
+    ("atitudes", "- 4.3 Atitudes/Valores"),
+    ("justificativa_mudanca", "- 5. Justificativa da mudança"),
+    ("formato_entrega", "- 7. Formato de entrega"),
+    ("formatos_tabelas", "<FORMATOS DAS TABELAS>"),
+    ("complementos", "</FORMATOS DAS TABELAS>"),
+    ("fim", "</FINE-TUNING>"),
+]
+
+# Orientações do prompt enviadas a cada item, além do núcleo comum e das seções do próprio item
+ORIENTACOES_POR_ITEM = {
+    1: ["formato_entrega"],
+    2: ["impacto", "justificativa_mudanca"],
+    3: ["novo_nome", "justificativa_mudanca"],
+    6: ["carga_horaria", "nova_carga_horaria", "justificativa_mudanca"],
+    7: ["indicadores", "justificativa_mudanca"],
+    8: ["elementos", "conhecimentos", "justificativa_mudanca"],
+    9: ["elementos", "habilidades", "atitudes", "justificativa_mudanca"],
+    10: ["elementos", "atitudes", "justificativa_mudanca"],
+    21: ["ptd"],
+    24: ["justificativa_mudanca"],
+}
+
+# Similaridade mínima entre títulos para associar uma seção do prompt a um item
+SIMILARIDADE_MINIMA = 0.6
+
+_secoes_em_memoria = {}
+
+
+def _entre(texto, inicio, fim):
+    """Trecho entre duas marcações (sem incluí-las), ou "" se alguma não existir."""
+    posicao_inicio = texto.find(inicio)
+    posicao_fim = texto.find(fim, posicao_inicio + 1)
+    if posicao_inicio == -1 or posicao_fim == -1:
+        return ""
+    return texto[posicao_inicio + len(inicio):posicao_fim]
+
+
+def _termos_titulo(titulo):
+    """Palavras normalizadas de um título, sem números (ex.: 'do item 9')."""
+    titulo = unicodedata.normalize("NFKD", titulo.lower())
+    titulo = "".join(c for c in titulo if not unicodedata.combining(c))
+    return {termo for termo in re.findall(r"[a-z]+", titulo) if termo != "item"}
+
+
+def _item_correspondente(titulo, titulos_itens):
+    """Número do item cujo título mais se parece com o título dado, ou None."""
+    termos = _termos_titulo(titulo)
+    melhor, melhor_similaridade = None, 0.0
+    for numero, titulo_item in titulos_itens.items():
+        termos_item = _termos_titulo(titulo_item)
+        similaridade = len(termos & termos_item) / max(len(termos | termos_item), 1)
+        if similaridade > melhor_similaridade:
+            melhor, melhor_similaridade = numero, similaridade
+    return melhor if melhor_similaridade >= SIMILARIDADE_MINIMA else None
+
+
+def _subsecoes(texto):
+    """Divide um texto nas subseções iniciadas por linhas '## '."""
+    subsecoes = []
+    for linha in texto.split("\n"):
+        if linha.startswith("## "):
+            subsecoes.append([linha[3:].strip(), linha + "\n"])
+        elif subsecoes:
+            subsecoes[-1][1] += linha + "\n"
+    return subsecoes
+
+
+def analisar_secoes(prompt_texto):
+    """Divide o prompt em núcleo comum, seções de cada item e orientações temáticas.
+
+    Retorna None se o prompt não tiver o bloco <24 ITENS DO RELATÓRIO>; nesse caso
+    o prompt deve ser enviado inteiro.
+    """
+    texto = prompt_texto.replace("\r\n", "\n")
+    bloco_itens = _entre(texto, "<24 ITENS DO RELATÓRIO>", "</24 ITENS DO RELATÓRIO>")
+    if not bloco_itens:
+        return None
+
+    itens = {}
+    titulos_itens = {}
+    for titulo, conteudo in _subsecoes(bloco_itens):
+        correspondencia = re.match(r"(\d+)\.\s*(.+)", titulo)
+        if correspondencia:
+            numero = int(correspondencia.group(1))
+            titulos_itens[numero] = correspondencia.group(2)
+            itens[numero] = [conteudo.strip()]
+
+    # Orientações temáticas do bloco <FINE-TUNING>
+    posicoes = []
+    inicio_busca = 0
+    for nome, marcador in MARCADORES_ORIENTACOES:
+        posicao = texto.find(marcador, inicio_busca)
+        if posicao != -1:
+            posicoes.append((nome, posicao))
+            inicio_busca = posicao + len(marcador)
+    orientacoes = {}
+    for (nome, posicao), (_, proxima) in zip(posicoes, posicoes[1:]):
+        orientacoes[nome] = texto[posicao:proxima].strip()
+
+    # Formatos de tabela e complementos são associados ao item de título correspondente
+    sem_item = []
+    for nome in ("formatos_tabelas", "complementos"):
+        for titulo, conteudo in _subsecoes(orientacoes.pop(nome, "")):
+            numero = _item_correspondente(re.sub(r"^\d+\.\s*", "", titulo), titulos_itens)
+            if numero is None:
+                sem_item.append(conteudo.strip())
+            else:
+                itens[numero].append(conteudo.strip())
+    orientacoes.pop("fim", None)
+
+    # Tudo o que não pertence a um item específico forma o núcleo comum
+    instrucoes = _entre(texto, "<INSTRUÇÕES>", "</INSTRUÇÕES>")
+    ptd = _entre(instrucoes, "<12 ITENS DO PTD>", "</12 ITENS DO PTD>")
+    if ptd:
+        instrucoes = instrucoes.replace(f"<12 ITENS DO PTD>{ptd}</12 ITENS DO PTD>", "")
+        orientacoes["ptd"] = f"<12 ITENS DO PTD>{ptd}</12 ITENS DO PTD>"
+    fim_fine_tuning = texto.find("</FINE-TUNING>")
+    finais = texto[fim_fine_tuning + len("</FINE-TUNING>"):] if fim_fine_tuning != -1 else ""
+    comum = "\n\n".join(parte.strip() for parte in [
+        f"<TAREFA>{_entre(texto, '<TAREFA>', '</TAREFA>')}</TAREFA>",
+        f"<INSTRUÇÕES>{instrucoes}</INSTRUÇÕES>",
+        f"<FONTES>{_entre(texto, '<FONTES>', '</FONTES>')}</FONTES>",
+        *sem_item,
+        finais,
+    ] if parte.strip())
+
+    return {"comum": comum, "itens": itens, "orientacoes": orientacoes}
+
+
+def obter_secoes(prompt_texto):
+    """Seções do prompt, analisadas uma única vez por conteúdo de prompt."""
+    chave = hashlib.sha256(prompt_texto.encode("utf-8")).hexdigest()
+    if chave not in _secoes_em_memoria:
+        _secoes_em_memoria[chave] = analisar_secoes(prompt_texto)
+    return _secoes_em_memoria[chave]
+
+
+def montar_prompt_comum(prompt_texto):
+    """Núcleo comum do prompt, idêntico para todos os itens (ou o prompt inteiro, se não houver seções)."""
+    secoes = obter_secoes(prompt_texto)
+    if secoes is None:
+        return prompt_texto
+    return secoes["comum"]
+
+
+def montar_prompt_especifico(prompt_texto, numero_item):
+    """Orientações e seções do prompt exclusivas de um item ("" se o prompt não tiver seções)."""
+    secoes = obter_secoes(prompt_texto)
+    if secoes is None:
+        return ""
+    partes = [secoes["orientacoes"][nome] for nome in ORIENTACOES_POR_ITEM.get(numero_item, []) if nome in secoes["orientacoes"]]
+    partes += secoes["itens"].get(numero_item, [])
+    return "\n\n".join(partes)
@@ -0,0 +1,269 @@
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fila_trabalhos import FilaTrabalhos, CONCLUIDO, ERRO, INTERVALO_PULSO
+from telemetria import telemetria
+
+# Intervalo entre consultas à fila quando não há sinal de trabalho novo (submissões de outros processos)
+INTERVALO_CONSULTA_FILA = 0.05
+
+# PCNs revisados ao mesmo tempo pelo serviço (cada um com até MAX_CONCORRENCIA chamadas simultâneas)
+CONCORRENCIA_PADRAO = 2
+
+
+class ServicoRevisao:
+    """Serviço residente que revisa os PCNs da fila com o prompt, os documentos base e o cliente já carregados.
+
+    pipeline é o módulo de main.py em execução (com o cache de respostas, o limitador e o
+    cliente já configurados). O prompt e os documentos base são recarregados apenas quando
+    os arquivos mudam.
+    """
+
+    def __init__(self, pipeline, fila, base_dir="BASE", prompt_file="prompt.txt", output_dir="RELATORIOS", usar_indice=True,
+                 agrupar_itens=False, por_uc=False, concorrencia=CONCORRENCIA_PADRAO, estrutura_llm=False):
+        self.pipeline = pipeline
+        self.fila = fila
+        self.base_dir = base_dir
+        self.prompt_file = prompt_file
+        self.output_dir = output_dir
+        self.usar_indice = usar_indice
+        self.agrupar_itens = agrupar_itens
+        self.por_uc = por_uc
+        self.concorrencia = concorrencia
+        self.estrutura_llm = estrutura_llm
+        self.lock = threading.Lock()
+        self.sinal = threading.Event()
+        self.parar = threading.Event()
+        self.assinatura = None
+        self.prompt_texto = None
+        self.documentos_base = None
+        self.indice_base = None
+
+    def _assinatura_entradas(self):
+        """Tamanho e data de modificação do prompt e dos documentos base."""
+        arquivos = [self.prompt_file] + [
+            os.path.join(self.base_dir, arquivo) for arquivo in sorted(os.listdir(self.base_dir)) if arquivo.endswith(".pdf")
+        ]
+        return tuple((arquivo, os.stat(arquivo).st_mtime_ns, os.stat(arquivo).st_size) for arquivo in arquivos)
+
+    def carregar(self):
+        """Carrega (ou recarrega, se os arquivos mudaram) o prompt e os documentos base.
+
+        Retorna (prompt_texto, documentos_base, indice_base).
+        """
+        with self.lock:
+            assinatura = self._assinatura_entradas()
+            if assinatura != self.assinatura:
+                if self.assinatura is not None:
+                    print("⚠️ O prompt ou os documentos base mudaram. Recarregando...")
+                self.prompt_texto = self.pipeline.ler_prompt(self.prompt_file)
+                self.pipeline.extrair_estrutura_relatorio(self.prompt_texto, usar_llm=self.estrutura_llm)
+                self.documentos_base, self.indice_base = self.pipeline.ler_documentos_base(self.base_dir, self.usar_indice)
+                self.assinatura = assinatura
+            return self.prompt_texto, self.documentos_base, self.indice_base
+
+    def processar(self, trabalho):
+        """Extrai, gera e renderiza o relatório de um trabalho, registrando o tempo de cada etapa."""
+        tempos = {"espera": trabalho["iniciado_em"] - trabalho["criado_em"]}
+        inicio = time.monotonic()
+        try:
+            with telemetria.span("trabalho", pcn=trabalho["nome"], trabalho=trabalho["id"]):
+                prompt_texto, documentos_base, indice_base = self.carregar()
+                tempos["carga"] = time.monotonic() - inicio
+
+                etapa = time.monotonic()
+                documento_pc = self.pipeline.ler_documento_pc(os.path.dirname(trabalho["arquivo"]), os.path.basename(trabalho["arquivo"]))
+                tempos["extracao"] = time.monotonic() - etapa
+
+                etapa = time.monotonic()
+                with telemetria.span("gerar_relatorio_completo", pcn=trabalho["nome"]):
+                    relatorio_texto = self.pipeline.gerar_relatorio_completo(
+                        prompt_texto,
+                        documentos_base,
+                        documento_pc,
+                        trabalho["nome"],
+                        regenerar=trabalho["opcoes"].get("regenerar", ()),
+                        indice_base=indice_base,
+                        agrupar=self.agrupar_itens,
+                        por_uc=self.por_uc
+                    )
+                tempos["geracao"] = time.monotonic() - etapa
+
+                etapa = time.monotonic()
+                caminho = self.pipeline.renderizar_relatorio(trabalho["nome"], relatorio_texto, self.output_dir)
+                tempos["renderizacao"] = time.monotonic() - etapa
+            tempos["total"] = time.monotonic() - inicio
+            self.fila.finalizar(trabalho["id"], CONCLUIDO, tempos, resultado=caminho)
+            print(f"[trabalho {trabalho['id']}] {trabalho['nome']} concluído em {tempos['total']:.1f}s: {caminho}")
+        except Exception as e:
+            tempos["total"] = time.monotonic() - inicio
+            self.fila.finalizar(trabalho["id"], ERRO, tempos, erro=str(e))
+            print(f"[trabalho {trabalho['id']}] {trabalho['nome']} FALHOU: {str(e)}")
+        finally:
+            # Uma vaga foi liberada: o laço principal reserva o próximo trabalho
+            self.sinal.set()
+
+    def recuperar_interrompidos(self):
+        """Devolve à fila os trabalhos de serviços que pararam (ver FilaTrabalhos.recuperar_interrompidos)."""
+        recuperados = self.fila.recuperar_interrompidos()
+        if recuperados:
+            print(f"  → {recuperados} trabalhos interrompidos devolvidos à fila")
+
+    def _pulsar(self, encerrado):
+        """Renova o pulso dos trabalhos deste serviço e recupera os de serviços que pararam, até 'encerrado'."""
+        while not encerrado.wait(INTERVALO_PULSO):
+            try:
+                self.fila.pulsar()
+                self.recuperar_interrompidos()
+            except Exception as e:
+                print(f"⚠️ Falha ao renovar o pulso dos trabalhos: {str(e)}")
+
+    def executar(self):
+        """Consome a fila até parar() ou Ctrl+C; os trabalhos em andamento terminam antes da saída.
+
+        Uma thread renova o pulso dos trabalhos em andamento (inclusive durante o
+        encerramento), para que outro serviço na mesma fila não os execute de novo.
+        """
+        self.recuperar_interrompidos()
+        self.carregar()
+        # O cliente (com seu pool de conexões HTTP) é criado uma vez e reaproveitado por todos os trabalhos
+        self.pipeline.obter_cliente()
+        print(f"Serviço pronto: até {self.concorrencia} PCNs simultâneos")
+
+        em_execucao = {}
+        encerrado = threading.Event()
+        threading.Thread(target=self._pulsar, args=(encerrado,), daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+                try:
+                    while not self.parar.is_set():
+                        for futuro in [futuro for futuro in em_execucao if futuro.done()]:
+                            del em_execucao[futuro]
+                        while len(em_execucao) < self.concorrencia:
+                            trabalho = self.fila.obter_proximo(ignorar_nomes=list(em_execucao.values()))
+                            if trabalho is None:
+                                break
+                            print(f"[trabalho {trabalho['id']}] {trabalho['nome']} iniciado ({1000 * (trabalho['iniciado_em'] - trabalho['criado_em']):.0f} ms na fila)")
+                            em_execucao[executor.submit(self.processar, trabalho)] = trabalho["nome"]
+                        self.sinal.wait(INTERVALO_CONSULTA_FILA)
+                        self.sinal.clear()
+                except KeyboardInterrupt:
+                    print(f"\nEncerrando o serviço: aguardando {len(em_execucao)} trabalhos em andamento...")
+        finally:
+            encerrado.set()
+
+    def servir_http(self, porta, host="127.0.0.1"):
+        """Expõe a fila em HTTP (JSON): GET /trabalhos, GET /trabalhos/<id> e POST /trabalhos."""
+        servico = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, dados):
+                corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                partes = self.path.strip("/").split("/")
+                if partes == ["trabalhos"]:
+                    self._json(200, servico.fila.listar())
+                elif len(partes) == 2 and partes[0] == "trabalhos" and partes[1].isdigit():
+                    trabalho = servico.fila.obter(int(partes[1]))
+                    self._json(200 if trabalho else 404, trabalho or {"erro": "trabalho não encontrado"})
+                else:
+                    self._json(404, {"erro": "caminho não encontrado"})
+
+            def do_POST(self):
+                if self.path.strip("/") != "trabalhos":
+                    self._json(404, {"erro": "caminho não encontrado"})
+                    return
+                try:
+                    dados = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    arquivo = dados["arquivo"]
+                    regenerar = dados.get("regenerar", [])
+                    if isinstance(regenerar, str):
+                        regenerar = regenerar.split(",")
+                    regenerar = [int(numero) for numero in regenerar if str(numero).strip()]
+                except (ValueError, KeyError, TypeError):
+                    self._json(400, {"erro": "informe {\"arquivo\": caminho do PDF, \"regenerar\": números dos itens (opcional)}"})
+                    return
+                if not os.path.exists(arquivo):
+                    self._json(400, {"erro": f"arquivo não encontrado: {arquivo}"})
+                    return
+                invalidos = [numero for numero in regenerar if not 1 <= numero <= servico.pipeline.ULTIMO_ITEM]
+                if invalidos:
+                    self._json(400, {"erro": f"itens inexistentes em regenerar: {invalidos}"})
+                    return
+                id_trabalho = servico.fila.enfileirar(arquivo, {"regenerar": regenerar})
+                servico.sinal.set()
+                self._json(201, servico.fila.obter(id_trabalho))
+
+        servidor = ThreadingHTTPServer((host, porta), Manipulador)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        print(f"Fila disponível em http://{host}:{servidor.server_address[1]}/trabalhos")
+        return servidor
+
+
+def servir(pipeline, fila_caminho="CACHE/trabalhos.sqlite3", base_dir="BASE", prompt_file="prompt.txt", output_dir="RELATORIOS",
+           usar_indice=True, namespace_cache="padrao", somente_replay=False, usar_cache_respostas=True,
+           telemetria_dir="TELEMETRIA", streaming=True, agrupar_itens=False, por_uc=False,
+           concorrencia=CONCORRENCIA_PADRAO, porta=None, estrutura_llm=False):
+    """Inicia o serviço residente (subcomando serve) com as funções de geração do módulo 'pipeline'.
+
+    O módulo é recebido de main.py, e não importado aqui: com "python main.py serve" ele é
+    __main__, e um "import main" carregaria uma segunda cópia, com outro cache e outro limitador.
+    """
+    pipeline.configurar_cache_respostas(namespace_cache, somente_replay, usar_cache_respostas)
+    pipeline.usar_streaming = streaming
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    telemetria.configurar(os.path.join(telemetria_dir, f"servico_{timestamp}.jsonl"))
+
+    servico = ServicoRevisao(
+        pipeline, FilaTrabalhos(fila_caminho), base_dir, prompt_file, output_dir, usar_indice, agrupar_itens, por_uc, concorrencia,
+        estrutura_llm
+    )
+    if porta is not None:
+        servico.servir_http(porta)
+    try:
+        servico.executar()
+    finally:
+        telemetria.imprimir_resumo()
+        telemetria.fechar()
+
+
+def enfileirar(arquivos, fila_caminho="CACHE/trabalhos.sqlite3", regenerar=()):
+    """Acrescenta PDFs de PCN à fila do serviço (subcomando submit)."""
+    fila = FilaTrabalhos(fila_caminho)
+    for arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            print(f"⚠️ Arquivo não encontrado: {arquivo}")
+            continue
+        print(f"Trabalho {fila.enfileirar(arquivo, {'regenerar': list(regenerar)})}: {arquivo}")
+
+
+def imprimir_status(ids=(), fila_caminho="CACHE/trabalhos.sqlite3", limite=20):
+    """Imprime a situação e os tempos por etapa dos trabalhos (subcomando status)."""
+    fila = FilaTrabalhos(fila_caminho)
+    trabalhos = [fila.obter(id_trabalho) for id_trabalho in ids] if ids else fila.listar(limite)
+    etapas = {"espera": "Espera", "extracao": "Extração", "geracao": "Geração", "renderizacao": "Renderização", "total": "Total"}
+    print(f"{'ID':>5}  {'PCN':<24}{'Situação':<12}" + "".join(f"{rotulo + ' (s)':>18}" for rotulo in etapas.values()) + "  Resultado")
+    for trabalho in trabalhos:
+        if trabalho is None:
+            continue
+        tempos = dict(trabalho["tempos"])
+        if trabalho["iniciado_em"] is not None:
+            tempos.setdefault("espera", trabalho["iniciado_em"] - trabalho["criado_em"])
+        colunas = "".join(f"{tempos[etapa]:>18.2f}" if etapa in tempos else f"{'-':>18}" for etapa in etapas)
+        resultado = trabalho["resultado"] or trabalho["erro"] or ""
+        print(f"{trabalho['id']:>5}  {trabalho['nome'][:23]:<24}{trabalho['status']:<12}{colunas}  {resultado}")
@@ -0,0 +1,69 @@
+import re
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.table import Table
+
+# Caracteres de controle não permitidos em XML (comuns em texto extraído de PDF)
+CARACTERES_INVALIDOS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Unidades de largura: o Word usa vigésimos de ponto (dxa) e o python-docx usa EMU
+EMU_POR_DXA = 635
+
+
+def _runs_xml(texto, negrito=False):
+    """Runs de um parágrafo; quebras de linha viram <w:br/>, como em cell.text."""
+    if not texto:
+        return ""
+    propriedades = "<w:rPr><w:b/></w:rPr>" if negrito else ""
+    partes = []
+    for indice, linha in enumerate(CARACTERES_INVALIDOS.sub("", texto).split("\n")):
+        if indice:
+            partes.append("<w:br/>")
+        if linha:
+            partes.append(f'<w:t xml:space="preserve">{escape(linha)}</w:t>')
+    return f"<w:r>{propriedades}{''.join(partes)}</w:r>"
+
+
+def _linha_xml(celulas, larguras, cabecalho=False):
+    """XML de uma linha da tabela; o cabeçalho fica em negrito e centralizado."""
+    paragrafo = "<w:pPr><w:jc w:val=\"center\"/></w:pPr>" if cabecalho else ""
+    return "<w:tr>" + "".join(
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{largura}"/></w:tcPr>'
+        f"<w:p>{paragrafo}{_runs_xml(texto, negrito=cabecalho)}</w:p></w:tc>"
+        for texto, largura in zip(celulas, larguras)
+    ) + "</w:tr>"
+
+
+def adicionar_tabela(doc, colunas, dados, estilo="Table Grid", larguras=None):
+    """Acrescenta ao documento uma tabela montada em uma única passada sobre o XML.
+
+    Equivale a doc.add_table seguido de cell.text célula a célula, mas sem o custo
+    crescente de add_row() e de cada atribuição em tabelas grandes. colunas e dados vêm
+    de processar_tabela_markdown; larguras (em EMU, ex.: Inches(2)) é opcional e, sem
+    ela, a largura útil da página é dividida igualmente entre as colunas.
+    """
+    if larguras is None:
+        secao = doc.sections[-1]
+        largura_util = secao.page_width - secao.left_margin - secao.right_margin
+        larguras = [largura_util // len(colunas)] * len(colunas)
+    larguras_dxa = [int(largura) // EMU_POR_DXA for largura in larguras]
+    estilo_id = doc.styles[estilo].style_id
+
+    xml = (
+        f"<w:tbl {nsdecls('w')}>"
+        "<w:tblPr>"
+        f'<w:tblStyle w:val="{estilo_id}"/>'
+        '<w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+        ' w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        "</w:tblPr>"
+        "<w:tblGrid>" + "".join(f'<w:gridCol w:w="{largura}"/>' for largura in larguras_dxa) + "</w:tblGrid>"
+        + _linha_xml(colunas, larguras_dxa, cabecalho=True)
+        + "".join(_linha_xml(linha, larguras_dxa) for linha in dados)
+        + "</w:tbl>"
+    )
+    tbl = parse_xml(xml)
+    doc.element.body._insert_tbl(tbl)
+    return Table(tbl, doc._body)
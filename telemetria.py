@@ -0,0 +1,158 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Preço em dólares por milhão de tokens (entrada, entrada em cache e saída)
+PRECOS_POR_MILHAO = {
+    "gpt-4o": {"entrada": 2.50, "entrada_cache": 1.25, "saida": 10.00},
+}
+
+# Atributos herdados pelos spans internos (ex.: chamar_gpt dentro de gerar_item_relatorio)
+ATRIBUTOS_HERDADOS = ("pcn", "item", "grupo")
+
+# Spans que geram um item inteiro do relatório (em uma chamada ou com uma requisição por UC)
+SPANS_ITEM = ("gerar_item_relatorio", "gerar_item_por_uc")
+
+
+def estimar_custo(modelo, tokens_prompt, tokens_resposta, tokens_cache=0):
+    """Custo estimado de uma chamada, em dólares."""
+    precos = PRECOS_POR_MILHAO.get(modelo)
+    if precos is None:
+        return 0.0
+    return (
+        (tokens_prompt - tokens_cache) * precos["entrada"]
+        + tokens_cache * precos["entrada_cache"]
+        + tokens_resposta * precos["saida"]
+    ) / 1_000_000
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) pelo método do posto mais próximo."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[posicao]
+
+
+class Telemetria:
+    """Registro de spans (tempo, tokens, tentativas e custo) exportado em JSONL."""
+
+    def __init__(self):
+        self.registros = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.arquivo = None
+
+    def configurar(self, caminho):
+        """Passa a gravar cada span concluído no arquivo JSONL indicado."""
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with self.lock:
+            self.registros = []
+            self.arquivo = open(caminho, "a", encoding="utf-8")
+
+    def fechar(self):
+        """Fecha o arquivo JSONL; os spans seguintes ficam apenas em memória."""
+        with self.lock:
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+
+    @contextmanager
+    def span(self, nome, **atributos):
+        """Mede um trecho de código; o dicionário devolvido pode receber atributos extras."""
+        pilha = getattr(self.local, "pilha", None)
+        if pilha is None:
+            pilha = self.local.pilha = []
+        if pilha:
+            for chave in ATRIBUTOS_HERDADOS:
+                if chave in pilha[-1] and chave not in atributos:
+                    atributos[chave] = pilha[-1][chave]
+        registro = dict(atributos, nome=nome, inicio=time.time())
+        pilha.append(registro)
+        inicio = time.monotonic()
+        try:
+            yield registro
+            registro.setdefault("status", "ok")
+        except BaseException as e:
+            registro["status"] = "erro"
+            registro["erro"] = str(e)
+            raise
+        finally:
+            pilha.pop()
+            registro["duracao"] = time.monotonic() - inicio
+            self._gravar(registro)
+
+    def _gravar(self, registro):
+        with self.lock:
+            self.registros.append(registro)
+            if self.arquivo is not None:
+                self.arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+                self.arquivo.flush()
+
+    def imprimir_resumo(self):
+        """Imprime p50/p95 por etapa e por número de item, com tokens, acerto do cache de prefixo e custo estimado."""
+        with self.lock:
+            registros = list(self.registros)
+        if not registros:
+            return
+
+        print("\nResumo de telemetria por etapa:")
+        print(f"{'Etapa':<24}{'N':>5}{'p50 (s)':>10}{'p95 (s)':>10}{'Tokens':>10}{'Cache (%)':>11}{'Custo (US$)':>13}")
+        for nome in sorted({registro["nome"] for registro in registros}):
+            grupo = [registro for registro in registros if registro["nome"] == nome]
+            self._imprimir_linha(nome, grupo)
+
+        itens = [registro for registro in registros if registro["nome"] in SPANS_ITEM]
+        itens += self._itens_de_grupos(registros)
+        if itens:
+            print("\nResumo de telemetria por item:")
+            print(f"{'Item':<24}{'N':>5}{'p50 (s)':>10}{'p95 (s)':>10}{'Tokens':>10}{'Cache (%)':>11}{'Custo (US$)':>13}")
+            for numero in sorted({registro["item"] for registro in itens}):
+                grupo = [registro for registro in itens if registro["item"] == numero]
+                self._imprimir_linha(str(numero), grupo)
+
+        chamadas = [registro for registro in registros if registro["nome"] == "chamar_gpt" and not registro.get("cache")]
+        tokens_prompt = sum(registro.get("tokens_prompt", 0) for registro in chamadas)
+        if tokens_prompt:
+            tokens_cache = sum(registro.get("tokens_cache", 0) for registro in chamadas)
+            print(f"\nTokens de entrada servidos pelo cache de prefixo do provedor: {tokens_cache}/{tokens_prompt} ({100 * tokens_cache / tokens_prompt:.1f}%)")
+
+    @staticmethod
+    def _itens_de_grupos(registros):
+        """Um registro por item de cada grupo gerado com sucesso em uma única chamada (--agrupar).
+
+        Cada item recebe a duração do grupo e uma parte igual dos tokens e do custo; grupos
+        que falharam não entram, pois seus itens foram gerados um a um em spans próprios.
+        """
+        itens = []
+        for registro in registros:
+            if registro["nome"] != "gerar_grupo_relatorio" or registro.get("status") != "ok":
+                continue
+            numeros = registro.get("itens", [])
+            for numero in numeros:
+                item = dict(registro, item=numero)
+                for chave in ("tokens_prompt", "tokens_resposta", "tokens_cache", "custo"):
+                    if chave in registro:
+                        item[chave] = registro[chave] / len(numeros)
+                itens.append(item)
+        return itens
+
+    @staticmethod
+    def _imprimir_linha(rotulo, grupo):
+        duracoes = [registro["duracao"] for registro in grupo]
+        tokens = sum(registro.get("tokens_prompt", 0) + registro.get("tokens_resposta", 0) for registro in grupo)
+        custo = sum(registro.get("custo", 0.0) for registro in grupo)
+        tokens_prompt = sum(registro.get("tokens_prompt", 0) for registro in grupo)
+        tokens_cache = sum(registro.get("tokens_cache", 0) for registro in grupo)
+        acerto_cache = 100 * tokens_cache / tokens_prompt if tokens_prompt else 0.0
+        print(
+            f"{rotulo:<24}{len(grupo):>5}{percentil(duracoes, 50):>10.2f}"
+            f"{percentil(duracoes, 95):>10.2f}{tokens:>10.0f}{acerto_cache:>11.1f}{custo:>13.4f}"
+        )
+
+
+telemetria = Telemetria()